@@ -0,0 +1,58 @@
+"""Compares the in-memory EPW reader against the pvlib temp-file path.
+
+Usage: python benchmarks/bench_epw_reader.py [--years N] [--repeat N]
+
+The comparison needs pvlib (pip install -e .[bench]); without it only the in-memory reader is timed.
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+
+from synthetic_epw import make_epw_bytes  # noqa: E402
+from wind_temp_core import read_epw_bytes  # noqa: E402
+
+
+def _best_of(fn, repeat):
+    """Returns the fastest wall time (seconds) of `repeat` calls."""
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter(); fn(); best = min(best, time.perf_counter() - start)
+    return best
+
+
+def _pvlib_path(content):
+    """The previous load path: write to disk, parse every column with pvlib, keep two."""
+    from pvlib.iotools import read_epw
+    fd, path = tempfile.mkstemp(suffix='.epw')
+    try:
+        with os.fdopen(fd, 'wb') as f: f.write(content)
+        data, meta = read_epw(path)
+    finally:
+        os.remove(path)
+    return data[['temp_air', 'wind_speed']].copy(), meta
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--years', type=int, default=1)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    content = make_epw_bytes(years=args.years)
+    print(f"Synthetic EPW: {args.years} year(s), {len(content) / 1e6:.1f} MB")
+    ours = _best_of(lambda: read_epw_bytes(content), args.repeat)
+    print(f"read_epw_bytes : {ours * 1e3:8.1f} ms")
+    try:
+        theirs = _best_of(lambda: _pvlib_path(content), args.repeat)
+    except ImportError:
+        print("pvlib not installed; skipping comparison"); return
+    print(f"pvlib read_epw : {theirs * 1e3:8.1f} ms  ({theirs / ours:.1f}x slower)")
+
+
+if __name__ == '__main__':
+    main()
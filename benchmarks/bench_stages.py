@@ -0,0 +1,167 @@
+"""Times every stage of the app pipeline on synthetic EPW data and checks it against stored baselines.
+
+Usage: python benchmarks/bench_stages.py [--scenarios NAME ...] [--repeat N] [--update-baseline] [--tolerance F]
+
+Runs the same core functions the Streamlit script calls (no server needed). Exits with status 1 when a
+stage is slower than its baseline by more than the tolerance, or a figure payload grew. Timings are
+machine-specific: record a baseline on the machine that runs the check (`--update-baseline`).
+"""
+
+import argparse
+import json
+import os
+import platform
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+
+import numpy as np  # noqa: E402
+import plotly.io as pio  # noqa: E402
+
+from synthetic_epw import make_epw_bytes  # noqa: E402
+from wind_temp_core.density import bin_density, density_heatmap_trace  # noqa: E402
+from wind_temp_core.epw import load_station  # noqa: E402
+from wind_temp_core.figures import DEFAULT_CHART_OPTIONS, build_figure, default_axis_limits, hover_time_parts, scatter_trace  # noqa: E402
+from wind_temp_core.stats import StatisticsIndex  # noqa: E402
+from wind_temp_core.wind import log_law_factor  # noqa: E402
+
+DEFAULT_BASELINE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'baselines.json')
+SCENARIOS = {
+    '1y_hourly': dict(years=1),
+    '1y_15min': dict(years=1, records_per_hour=4),
+    '30y_hourly': dict(years=30),
+}
+TIME_STAGES = ['parse', 'adjust', 'stats', 'hover_times', 'scatter_figure', 'scatter_json', 'density_figure', 'density_json']
+SIZE_METRICS = ['scatter_json_bytes', 'density_json_bytes']
+
+
+def _best_of(fn, repeat):
+    """Returns (fastest wall time in seconds, result of the last call) over `repeat` calls."""
+    best, result = float('inf'), None
+    for _ in range(repeat):
+        start = time.perf_counter(); result = fn(); best = min(best, time.perf_counter() - start)
+    return best, result
+
+
+def _calibration():
+    """Fixed workload (numpy sort + interpreter loop) timed with every run, so baselines scale with machine speed and load."""
+    values = np.random.default_rng(0).random(1_000_000)
+    def work():
+        np.sort(values); sum(i * i for i in range(200_000))
+    return _best_of(work, 5)[0]
+
+
+def _warm_up():
+    """Builds and serializes tiny figures of both kinds so plotly's lazy imports are not charged to the first timed stage."""
+    temp, wind = np.array([0.0, 20.0]), np.array([1.0, 5.0])
+    stats = StatisticsIndex(temp, wind).summary(1.0, 18.0, 32.0, (50,))
+    for trace in (scatter_trace(temp, wind, np.zeros((2, 6), dtype=np.uint8)), density_heatmap_trace(bin_density(temp, wind))):
+        pio.to_json(build_figure([trace], stats, dict(x_range=(0, 1), y_range=(0, 1))), validate=False)
+
+
+def _load_arrays(content):
+    """Parse stage as the app runs it (load_station: in-memory read, incomplete rows dropped, float32 dataset)."""
+    dataset, _ = load_station(content)
+    return dataset, dataset.temp_air, dataset.wind_speed
+
+
+def run_scenario(content, repeat=5):
+    """Times each stage on one EPW payload; returns {stage: seconds} plus the serialized figure sizes in bytes."""
+    results = {}
+    results['parse'], (data, temp_values, wind_values) = _best_of(lambda: _load_arrays(content), repeat)
+
+    def adjust():
+        factor, _ = log_law_factor(10.0, 50.0, 0.03, 0.3)
+        return factor, wind_values * factor
+    results['adjust'], (factor, adjusted_wind) = _best_of(adjust, repeat)
+
+    opts = DEFAULT_CHART_OPTIONS
+    results['stats'], stats = _best_of(lambda: StatisticsIndex(temp_values, wind_values).summary(factor, opts['comfort_min'], opts['comfort_max'], (50, 99)), repeat)
+    results['hover_times'], time_parts = _best_of(lambda: hover_time_parts(data.index()), repeat)
+
+    x_range, y_range = default_axis_limits(temp_values, adjusted_wind)
+    layout = dict(x_range=x_range, y_range=y_range)
+    builders = {
+        'scatter': (lambda: scatter_trace(temp_values, adjusted_wind, time_parts), dict(layout, cmin=float(temp_values.min()), cmax=float(temp_values.max()))),
+        'density': (lambda: density_heatmap_trace(bin_density(temp_values, adjusted_wind)), dict(layout, colorbar_title="Records")),
+    }
+    for mode, (make_trace, options) in builders.items():
+        results[f'{mode}_figure'], fig = _best_of(lambda: build_figure([make_trace()], stats, options), repeat)
+        results[f'{mode}_json'], payload = _best_of(lambda: pio.to_json(fig, validate=False), repeat)  # What st.plotly_chart sends
+        results[f'{mode}_json_bytes'] = len(payload.encode('utf-8'))
+    return results
+
+
+def compare(current, baseline, tolerance, min_delta, speed_ratio=1.0):
+    """Returns a list of regression messages (empty when every stage is within tolerance).
+
+    `speed_ratio` is current / baseline calibration time; baseline timings are scaled by it first.
+    """
+    failures = []
+    for stage in TIME_STAGES:
+        new, old = current.get(stage), baseline.get(stage)
+        if new is None or old is None: continue
+        old *= speed_ratio
+        if new > old * (1 + tolerance) and new - old > min_delta:
+            failures.append(f"{stage}: {new * 1e3:.1f} ms vs baseline {old * 1e3:.1f} ms (+{(new / old - 1) * 100:.0f}%)")
+    for metric in SIZE_METRICS:
+        new, old = current.get(metric), baseline.get(metric)
+        if new is not None and old is not None and new > old * 1.01:  # Payload size is deterministic, so any real growth counts
+            failures.append(f"{metric}: {new:,} bytes vs baseline {old:,} bytes (+{(new / old - 1) * 100:.1f}%)")
+    return failures
+
+
+def print_table(name, current, baseline):
+    print(f"\n{name}")
+    for stage in TIME_STAGES:
+        old = baseline.get(stage)
+        ref = f"  (baseline {old * 1e3:8.1f} ms)" if old is not None else ""
+        print(f"  {stage:<16}{current[stage] * 1e3:10.1f} ms{ref}")
+    for metric in SIZE_METRICS:
+        old = baseline.get(metric)
+        ref = f"  (baseline {old / 1e6:8.2f} MB)" if old is not None else ""
+        print(f"  {metric:<20}{current[metric] / 1e6:6.2f} MB{ref}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--scenarios', nargs='+', choices=list(SCENARIOS), default=list(SCENARIOS))
+    parser.add_argument('--repeat', type=int, default=5, help="Runs per stage; the fastest is kept")
+    parser.add_argument('--baseline', default=DEFAULT_BASELINE_PATH, help="Baseline JSON file (default: %(default)s)")
+    parser.add_argument('--update-baseline', action='store_true', help="Record the measured values as the new baseline instead of checking")
+    parser.add_argument('--tolerance', type=float, default=0.5, help="Allowed relative slowdown per stage (default: %(default)s = +50%%)")
+    parser.add_argument('--min-delta-ms', type=float, default=5.0, help="Slowdowns smaller than this are treated as noise (default: %(default)s)")
+    args = parser.parse_args()
+
+    stored = {}
+    if os.path.exists(args.baseline):
+        with open(args.baseline, encoding='utf-8') as f: stored = json.load(f)
+    baselines = stored.get('scenarios', {})
+
+    _warm_up()
+    calibration = _calibration()
+    speed_ratio = calibration / stored['calibration'] if stored.get('calibration') else 1.0
+    print(f"Calibration workload: {calibration * 1e3:.1f} ms" + (f" ({speed_ratio:.2f}x the baseline machine; baseline timings scaled)" if stored.get('calibration') else ""))
+    measured, failures = {}, []
+    for name in args.scenarios:
+        content = make_epw_bytes(**SCENARIOS[name])
+        measured[name] = run_scenario(content, args.repeat)
+        print_table(f"{name}: {len(content) / 1e6:.1f} MB EPW", measured[name], baselines.get(name, {}))
+        if not args.update_baseline:
+            failures += [f"{name} {message}" for message in compare(measured[name], baselines.get(name, {}), args.tolerance, args.min_delta_ms / 1e3, speed_ratio)]
+
+    if args.update_baseline:
+        baselines.update({name: {key: round(value, 6) if isinstance(value, float) else value for key, value in values.items()} for name, values in measured.items()})
+        with open(args.baseline, 'w', encoding='utf-8') as f:
+            json.dump(dict(calibration=round(calibration, 6), machine=f"{platform.machine()} {platform.processor() or ''} Python {platform.python_version()}".replace('  ', ' '), scenarios=baselines), f, indent=2, sort_keys=True)
+            f.write('\n')
+        print(f"\nBaseline written to {args.baseline}"); return 0
+    if not baselines: print("\nNo baseline recorded yet; run with --update-baseline first"); return 0
+    if failures:
+        print("\nRegressions:"); print("\n".join(f"  {message}" for message in failures)); return 1
+    print("\nAll stages within tolerance"); return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,71 @@
+"""Generates synthetic EPW files so benchmarks run offline without real weather data.
+
+Usage: python benchmarks/synthetic_epw.py OUTPUT.epw [--years N] [--records-per-hour N] [--seed N]
+"""
+
+import argparse
+
+import numpy as np
+
+_DAYS_IN_MONTH = [31, 28, 31, 30, 31, 30, 31, 31, 30, 31, 30, 31]
+
+
+def make_epw_bytes(years=1, records_per_hour=1, start_year=1991, seed=0, city="Synthetic City"):
+    """Returns EPW bytes with plausible temperature / wind series (365-day years, no Feb 29)."""
+    rng = np.random.default_rng(seed)
+    step_minutes = 60 // records_per_hour
+    header = [
+        f"LOCATION,{city},ST,XYZ,Synthetic,999999,40.00,-75.00,-5.0,100.0",
+        "DESIGN CONDITIONS,0",
+        "TYPICAL/EXTREME PERIODS,0",
+        "GROUND TEMPERATURES,0",
+        "HOLIDAYS/DAYLIGHT SAVINGS,No,0,0,0",
+        "COMMENTS 1,Synthetic data for benchmarking",
+        "COMMENTS 2,",
+        f"DATA PERIODS,1,{records_per_hour},Data,Sunday, 1/ 1,12/31",
+    ]
+
+    # --- Calendar columns (vectorized over all records) ---
+    month = np.repeat(np.arange(1, 13), np.array(_DAYS_IN_MONTH) * 24 * records_per_hour)
+    day = np.concatenate([np.repeat(np.arange(1, d + 1), 24 * records_per_hour) for d in _DAYS_IN_MONTH])
+    hour = np.tile(np.repeat(np.arange(1, 25), records_per_hour), 365)
+    minute = np.tile((np.arange(records_per_hour) + 1) * step_minutes, 365 * 24)
+    per_year = len(month)
+    year = np.repeat(np.arange(start_year, start_year + years), per_year)
+    month, day, hour, minute = (np.tile(a, years) for a in (month, day, hour, minute))
+
+    # --- Seasonal + diurnal temperature, Weibull-ish wind ---
+    n = years * per_year
+    t = np.arange(n) / (24 * records_per_hour)
+    temp_air = 12 - 12 * np.cos(2 * np.pi * t / 365) - 5 * np.cos(2 * np.pi * (t % 1)) + rng.normal(0, 2, n)
+    wind_speed = np.clip(rng.weibull(2.0, n) * 4.5, 0, 30)
+
+    fixed_tail = ",9999,9999,0,0,0,0,0,0,0,0,180," + "{}" + ",5,5,16.0,77777,9,999999999,10,0.1,0,88,0.2,0,1"
+    lines = header[:]
+    for row in zip(year, month, day, hour, minute, temp_air, wind_speed):
+        lines.append(f"{row[0]},{row[1]},{row[2]},{row[3]},{row[4]},?9?9?9?9E0?9?9?9,{row[5]:.1f},5.0,70,101325" + fixed_tail.format(f"{row[6]:.1f}"))
+    return ("\n".join(lines) + "\n").encode('utf-8')
+
+
+def write_epw_file(path, **kwargs):
+    """Writes `make_epw_bytes(**kwargs)` to `path`; returns the number of bytes written."""
+    content = make_epw_bytes(**kwargs)
+    with open(path, 'wb') as f: f.write(content)
+    return len(content)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('output', help="Path of the .epw file to write")
+    parser.add_argument('--years', type=int, default=1)
+    parser.add_argument('--records-per-hour', type=int, default=1, choices=[1, 2, 3, 4, 6, 12, 60], help="Sub-hourly resolution (e.g. 4 = 15-minute data)")
+    parser.add_argument('--start-year', type=int, default=1991)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--city', default="Synthetic City")
+    args = parser.parse_args()
+    size = write_epw_file(args.output, years=args.years, records_per_hour=args.records_per_hour, start_year=args.start_year, seed=args.seed, city=args.city)
+    print(f"Wrote {args.output} ({size / 1e6:.1f} MB)")
+
+
+if __name__ == '__main__':
+    main()
@@ -43,6 +43,12 @@ setup(
     python_requires='>=3.7',
     install_requires=requirements,
     extras_require={
+        'export': [
+            'kaleido>=1.0',
+        ],
+        'bench': [
+            'pvlib',
+        ],
         'dev': [
             'pytest>=6.0',
             'pytest-cov>=2.0',
@@ -56,6 +62,7 @@ setup(
     entry_points={
         'console_scripts': [
             'wind-temp-visualizer=wind_temp_visualizer:main',
+            'wind-temp-batch=wind_temp_core.batch:main',
         ],
     },
     include_package_data=True,
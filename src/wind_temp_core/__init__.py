@@ -0,0 +1,3 @@
+"""Streamlit-free building blocks shared by the visualizer app."""
+
+from .epw import EPW_COLUMNS, load_station, read_epw_bytes
@@ -0,0 +1,182 @@
+"""Headless batch renderer: charts and statistics for a directory of EPW files.
+
+Usage: wind-temp-batch INPUT_DIR -o OUTPUT_DIR [--formats png svg html] [--workers N]
+"""
+
+import argparse
+import csv
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from .density import DEFAULT_DENSITY_THRESHOLD, bin_density, density_heatmap_trace, use_density_mode
+from .epw import load_station
+from .figures import DEFAULT_CHART_OPTIONS, build_figure, default_axis_limits, hover_time_parts, scatter_trace
+from .stats import StatisticsIndex
+from .wind import log_law_factor
+
+IMAGE_FORMATS = ('png', 'svg')
+STATS_COLUMNS = ['file', 'city', 'records', 'adjustment_factor', 'avg_wind', 'p95_wind', 'comfort_pct', 'seconds', 'warning', 'error']
+
+
+def percentile_column(q):
+    """stats.csv column of an extra wind speed percentile (e.g. p99_wind)."""
+    return f"p{q:g}_wind"
+
+
+def stats_columns(percentiles=()):
+    """STATS_COLUMNS with one column per extra percentile after p95_wind (P95 itself is already there)."""
+    extra = [column for column in dict.fromkeys(percentile_column(q) for q in percentiles) if column not in STATS_COLUMNS]
+    position = STATS_COLUMNS.index('p95_wind') + 1
+    return STATS_COLUMNS[:position] + extra + STATS_COLUMNS[position:]
+
+
+def find_epw_files(input_dir, recursive=False):
+    """Sorted .epw paths in a directory (optionally including subdirectories)."""
+    if not recursive:
+        return sorted(os.path.join(input_dir, name) for name in os.listdir(input_dir) if name.lower().endswith('.epw'))
+    return sorted(os.path.join(root, name) for root, _, names in os.walk(input_dir) for name in names if name.lower().endswith('.epw'))
+
+
+def render_epw_file(path, output_dir, settings):
+    """Loads, adjusts and charts one EPW file the same way the app does; returns its stats row (errors are recorded, not raised)."""
+    start = time.perf_counter()
+    name = os.path.splitext(os.path.basename(path))[0]
+    row = dict(file=os.path.basename(path), city='', records=0, adjustment_factor=1.0, avg_wind='', p95_wind='', comfort_pct='', warning='', error='')
+    try:
+        with open(path, 'rb') as f: data, meta = load_station(f.read())
+        if data.empty: raise ValueError("no valid data rows after processing")
+        temp_values, wind_values = data.temp_air, data.wind_speed
+        row.update(city=meta.get('city', ''), records=data.size)
+
+        # --- Wind adjustment and statistics (same stages as the app) ---
+        factor = 1.0
+        if settings['adjust']:
+            factor, warning = log_law_factor(settings['reference_height'], settings['site_height'], settings['roughness_station'], settings['roughness_site'])
+            if warning: row['warning'] = warning
+        adjusted_wind = wind_values * factor
+        stats = StatisticsIndex(temp_values, wind_values).summary(factor, settings['comfort_min'], settings['comfort_max'], settings['extra_percentiles'])
+        row.update(adjustment_factor=round(factor, 6), avg_wind=round(stats['avg'], 3), p95_wind=round(stats['p95'], 3), comfort_pct=round(stats['comfort_pct'], 2))
+        row.update({percentile_column(q): round(value, 3) for q, value in stats['extra_percentiles']})
+
+        # --- Figure ---
+        if use_density_mode(settings['render_mode'], len(temp_values), settings['density_threshold']):
+            trace = density_heatmap_trace(bin_density(temp_values, adjusted_wind)); colorbar_title, cmin, cmax = "Records", None, None
+        else:
+            trace = scatter_trace(temp_values, adjusted_wind, hover_time_parts(data.index()), settings['marker_size'])
+            colorbar_title, cmin, cmax = DEFAULT_CHART_OPTIONS['colorbar_title'], float(temp_values.min()), float(temp_values.max())
+        x_range, y_range = default_axis_limits(temp_values, adjusted_wind)
+        fig = build_figure([trace], stats, dict(width=settings['width'], height=settings['height'], x_range=x_range, y_range=y_range, colorscale=settings['colorscale'],
+                                                colorbar_title=colorbar_title, cmin=cmin, cmax=cmax, comfort_min=settings['comfort_min'], comfort_max=settings['comfort_max']))
+        fig.update_layout(title=meta.get('city', name))
+        for fmt in settings['formats']:
+            out_path = os.path.join(output_dir, f"{name}.{fmt}")
+            if fmt == 'html': fig.write_html(out_path, include_plotlyjs='cdn', config={'displaylogo': False})
+            else: fig.write_image(out_path, format=fmt, scale=settings['scale'])
+    except Exception as e:
+        row['error'] = f"{type(e).__name__}: {' '.join(str(e).split())}"
+    row['seconds'] = round(time.perf_counter() - start, 3)
+    return row
+
+
+def _render_job(job):
+    """Process-pool entry point (module level so it pickles)."""
+    return render_epw_file(*job)
+
+
+def run_batch(paths, output_dir, settings, workers=None, progress=None):
+    """Renders every path across a process pool; returns the stats rows in input order."""
+    os.makedirs(output_dir, exist_ok=True)
+    jobs = [(path, output_dir, settings) for path in paths]
+    if workers == 1: results = map(_render_job, jobs)
+    else:
+        executor = ProcessPoolExecutor(max_workers=workers)
+        results = executor.map(_render_job, jobs, chunksize=max(1, len(jobs) // (4 * (workers or os.cpu_count() or 1))))
+    rows = []
+    try:
+        for row in results:
+            rows.append(row)
+            if progress: progress(len(rows), len(jobs), row)
+    finally:
+        if workers != 1: executor.shutdown()
+    return rows
+
+
+def write_stats_csv(rows, path, percentiles=()):
+    """Writes the consolidated per-file statistics table (one extra column per requested percentile)."""
+    with open(path, 'w', newline='', encoding='utf-8') as f:
+        writer = csv.DictWriter(f, fieldnames=stats_columns(percentiles)); writer.writeheader(); writer.writerows(rows)
+
+
+def _positive_int(text):
+    """argparse type for counts that must be at least 1."""
+    try: value = int(text)
+    except ValueError: raise argparse.ArgumentTypeError(f"invalid int value: {text!r}")
+    if value < 1: raise argparse.ArgumentTypeError(f"must be at least 1, got {value}")
+    return value
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog='wind-temp-batch', description="Render wind speed vs. temperature charts and statistics for every EPW file in a directory.")
+    parser.add_argument('input_dir', help="Directory containing .epw files")
+    parser.add_argument('-o', '--output-dir', default='wind_temp_output', help="Where charts and stats.csv are written (default: %(default)s)")
+    parser.add_argument('-f', '--formats', nargs='+', choices=['png', 'svg', 'html'], default=['png'], help="Chart formats to write (png/svg need kaleido and Chrome/Chromium)")
+    parser.add_argument('-j', '--workers', type=_positive_int, default=None, help="Worker processes (default: CPU count; 1 runs in-process)")
+    parser.add_argument('-r', '--recursive', action='store_true', help="Also search subdirectories")
+    parser.add_argument('--stats-file', default='stats.csv', help="Name of the consolidated stats CSV inside the output directory")
+    group = parser.add_argument_group('statistics')
+    group.add_argument('--comfort-min', type=float, default=DEFAULT_CHART_OPTIONS['comfort_min'])
+    group.add_argument('--comfort-max', type=float, default=DEFAULT_CHART_OPTIONS['comfort_max'])
+    group.add_argument('--percentiles', type=float, nargs='*', default=[], help="Extra wind speed percentile lines, e.g. 50 90 99")
+    group = parser.add_argument_group('wind speed height adjustment (applied when --site-height is given)')
+    group.add_argument('--reference-height', type=float, default=10.0)
+    group.add_argument('--site-height', type=float, default=None)
+    group.add_argument('--roughness-station', type=float, default=0.03)
+    group.add_argument('--roughness-site', type=float, default=0.03)
+    group = parser.add_argument_group('chart')
+    group.add_argument('--render-mode', choices=['Auto', 'Scatter', 'Density'], default='Auto')
+    group.add_argument('--density-threshold', type=int, default=DEFAULT_DENSITY_THRESHOLD)
+    group.add_argument('--width', type=int, default=DEFAULT_CHART_OPTIONS['width'])
+    group.add_argument('--height', type=int, default=DEFAULT_CHART_OPTIONS['height'])
+    group.add_argument('--scale', type=float, default=1.0, help="Image scale factor for png/svg")
+    group.add_argument('--marker-size', type=int, default=4)
+    group.add_argument('--colorscale', default=DEFAULT_CHART_OPTIONS['colorscale'])
+    return parser
+
+
+def main(argv=None):
+    """Console entry point."""
+    args = build_parser().parse_args(argv)
+    if not os.path.isdir(args.input_dir): print(f"error: {args.input_dir} is not a directory", file=sys.stderr); return 2
+    if any(fmt in IMAGE_FORMATS for fmt in args.formats):
+        try: import kaleido  # noqa: F401
+        except ImportError: print("error: png/svg export needs kaleido (pip install kaleido), or use --formats html", file=sys.stderr); return 2
+    paths = find_epw_files(args.input_dir, args.recursive)
+    if not paths: print(f"No .epw files found in {args.input_dir}", file=sys.stderr); return 1
+
+    settings = dict(
+        formats=args.formats, adjust=args.site_height is not None, reference_height=args.reference_height, site_height=args.site_height or args.reference_height,
+        roughness_station=args.roughness_station, roughness_site=args.roughness_site, comfort_min=args.comfort_min, comfort_max=args.comfort_max,
+        extra_percentiles=sorted(args.percentiles), render_mode=args.render_mode, density_threshold=args.density_threshold,
+        width=args.width, height=args.height, scale=args.scale, marker_size=args.marker_size, colorscale=args.colorscale,
+    )
+    def progress(done, total, row):
+        status = f"ERROR {row['error']}" if row['error'] else f"{row['records']} records, {row['seconds']:.2f}s"
+        print(f"[{done}/{total}] {row['file']}: {status}")
+
+    start = time.perf_counter()
+    rows = run_batch(paths, args.output_dir, settings, workers=args.workers, progress=progress)
+    elapsed = time.perf_counter() - start
+    stats_path = os.path.join(args.output_dir, args.stats_file)
+    write_stats_csv(rows, stats_path, settings['extra_percentiles'])
+
+    failed = sum(1 for row in rows if row['error'])
+    records = sum(row['records'] for row in rows)
+    print(f"Processed {len(rows)} file(s) in {elapsed:.2f}s: {len(rows) / elapsed:.2f} files/s, {records / elapsed:,.0f} records/s ({failed} failed)")
+    print(f"Stats written to {stats_path}")
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,71 @@
+"""Compact in-memory form of a parsed station: float32 values on a start + step time axis."""
+
+import numpy as np
+import pandas as pd
+
+VALUE_DTYPE = np.float32
+
+
+class CompactDataset:
+    """temp_air / wind_speed as float32 arrays plus a time axis, instead of a DataFrame with a tz-aware index.
+
+    Evenly spaced records (the usual EPW case) keep only `start` and `step`; files with gaps (dropped
+    rows, skipped leap days) also keep `offsets`, an int32 step count per record. The DatetimeIndex is
+    rebuilt on demand by `index()` for the few callers that need calendar fields, and is not kept.
+    """
+
+    def __init__(self, temp_air, wind_speed, start, step, offsets=None):
+        self.temp_air = np.ascontiguousarray(temp_air, dtype=VALUE_DTYPE)
+        self.wind_speed = np.ascontiguousarray(wind_speed, dtype=VALUE_DTYPE)
+        self.start, self.step = start, pd.Timedelta(step)
+        self.offsets = None if offsets is None else np.ascontiguousarray(offsets, dtype=np.int32)
+
+    @classmethod
+    def from_frame(cls, data):
+        """Builds the compact form of a frame with temp_air / wind_speed columns and a DatetimeIndex."""
+        temp_air, wind_speed = data['temp_air'].to_numpy(), data['wind_speed'].to_numpy()
+        if len(data) < 2: return cls(temp_air, wind_speed, data.index[0] if len(data) else None, pd.Timedelta(hours=1))
+        ns = data.index.as_unit('ns').asi8
+        deltas = np.diff(ns)
+        step = int(deltas.min())
+        if step > 0 and (deltas == step).all(): offsets = None
+        else:
+            if step <= 0 or (deltas % step).any(): step = 60 * 10**9  # Irregular spacing: count whole minutes instead
+            offsets = (ns - ns[0]) // step
+        return cls(temp_air, wind_speed, data.index[0], pd.Timedelta(step, unit='ns'), offsets)
+
+    @property
+    def size(self):
+        return self.temp_air.size
+
+    @property
+    def empty(self):
+        return self.size == 0
+
+    @property
+    def nbytes(self):
+        return self.temp_air.nbytes + self.wind_speed.nbytes + (self.offsets.nbytes if self.offsets is not None else 0)
+
+    def index(self):
+        """Materializes the tz-aware DatetimeIndex (callers use it transiently and cache what they derive)."""
+        if self.empty: return pd.DatetimeIndex([], tz=getattr(self.start, 'tz', None))
+        if self.offsets is None: return pd.date_range(self.start, periods=self.size, freq=self.step)
+        return self.start + pd.to_timedelta(self.offsets.astype(np.int64) * self.step.value, unit='ns')
+
+    # --- Serialization (used by the store's .npz spill) ---
+    def to_arrays(self):
+        """Plain arrays and scalars for np.savez; `from_arrays` is the inverse."""
+        arrays = dict(temp_air=self.temp_air, wind_speed=self.wind_speed, step_ns=np.int64(self.step.value))
+        if self.start is not None:
+            arrays['start_ns'] = np.int64(self.start.value)  # UTC nanoseconds for tz-aware starts
+            if self.start.tz is not None: arrays['tz_seconds'] = np.int64(self.start.utcoffset().total_seconds())
+        if self.offsets is not None: arrays['offsets'] = self.offsets
+        return arrays
+
+    @classmethod
+    def from_arrays(cls, arrays):
+        start = None
+        if 'start_ns' in arrays:
+            start = pd.Timestamp(int(arrays['start_ns']), unit='ns')
+            if 'tz_seconds' in arrays: start = start.tz_localize('UTC').tz_convert(int(arrays['tz_seconds']))
+        return cls(arrays['temp_air'], arrays['wind_speed'], start, pd.Timedelta(int(arrays['step_ns']), unit='ns'), arrays['offsets'] if 'offsets' in arrays else None)
@@ -0,0 +1,58 @@
+"""Server-side temperature x wind speed binning for datasets too large to scatter-plot."""
+
+import numpy as np
+
+DEFAULT_DENSITY_THRESHOLD = 50_000
+MIN_DENSITY_THRESHOLD = 1000  # Lowest value the app's threshold input accepts
+DENSITY_THRESHOLD_ENV_VAR = 'WTV_DENSITY_THRESHOLD'
+
+
+def bin_density(x, y, x_bins=120, y_bins=80):
+    """Bins paired x/y samples into a 2-D grid; returns edges, counts and per-bin means of x and y."""
+    x = np.asarray(x, dtype=np.float64); y = np.asarray(y, dtype=np.float64)
+    if x.size == 0:
+        empty = np.zeros((x_bins, y_bins))
+        return dict(x_edges=np.linspace(0, 1, x_bins + 1), y_edges=np.linspace(0, 1, y_bins + 1), counts=empty, mean_x=empty, mean_y=empty)
+    x_lo, x_hi = float(x.min()), float(x.max()); y_lo, y_hi = float(y.min()), float(y.max())
+    if x_hi <= x_lo: x_hi = x_lo + 1.0
+    if y_hi <= y_lo: y_hi = y_lo + 1.0
+
+    # Bin index per sample, then one bincount each for counts and sums (a single O(n) pass)
+    xi = np.minimum(((x - x_lo) / (x_hi - x_lo) * x_bins).astype(np.int64), x_bins - 1)
+    yi = np.minimum(((y - y_lo) / (y_hi - y_lo) * y_bins).astype(np.int64), y_bins - 1)
+    flat = xi * y_bins + yi
+    size = x_bins * y_bins
+    counts = np.bincount(flat, minlength=size).astype(np.float64)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        mean_x = np.bincount(flat, weights=x, minlength=size) / counts
+        mean_y = np.bincount(flat, weights=y, minlength=size) / counts
+    shape = (x_bins, y_bins)
+    return dict(x_edges=np.linspace(x_lo, x_hi, x_bins + 1), y_edges=np.linspace(y_lo, y_hi, y_bins + 1),
+                counts=counts.reshape(shape), mean_x=mean_x.reshape(shape), mean_y=mean_y.reshape(shape))
+
+
+def use_density_mode(render_mode, n_points, threshold=DEFAULT_DENSITY_THRESHOLD):
+    """Resolves the 'Auto' / 'Scatter' / 'Density' render choice for a dataset size."""
+    if render_mode == 'Density': return True
+    if render_mode == 'Scatter': return False
+    return n_points > threshold
+
+
+def density_threshold_from_env(environ):
+    """WTV_DENSITY_THRESHOLD as an int clamped to MIN_DENSITY_THRESHOLD; unset or non-numeric values give the default."""
+    try: value = int(float(environ.get(DENSITY_THRESHOLD_ENV_VAR, DEFAULT_DENSITY_THRESHOLD)))
+    except (ValueError, OverflowError): value = DEFAULT_DENSITY_THRESHOLD
+    return max(value, MIN_DENSITY_THRESHOLD)
+
+
+def density_heatmap_trace(binned, coloraxis='coloraxis'):
+    """Builds a Heatmap trace dict from `bin_density` output, colored by the layout `coloraxis`; empty bins stay transparent."""
+    x_edges, y_edges = binned['x_edges'], binned['y_edges']
+    counts = binned['counts'].T  # Heatmap z is indexed [row=y][col=x]
+    z = np.where(counts > 0, counts, np.nan).astype(np.float32)  # float32 typed arrays halve the payload
+    customdata = np.dstack([binned['mean_x'].T, binned['mean_y'].T]).astype(np.float32)
+    return dict(
+        type='heatmap', x=(x_edges[:-1] + x_edges[1:]) / 2, y=(y_edges[:-1] + y_edges[1:]) / 2, z=z, customdata=customdata,
+        coloraxis=coloraxis, hoverongaps=False,
+        hovertemplate="<b>Records:</b> %{z:,.0f}<br><b>Mean Temp:</b> %{customdata[0]:.1f} °C<br><b>Mean Wind Speed:</b> %{customdata[1]:.1f} m/s<extra></extra>",
+    )
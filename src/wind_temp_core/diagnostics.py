@@ -0,0 +1,90 @@
+"""Opt-in per-rerun instrumentation: stage timings, serialized figure sizes and cache hits as JSON log lines."""
+
+import json
+import logging
+import time
+from contextlib import contextmanager
+
+import plotly.io as pio
+
+DIAGNOSTICS_ENV_VAR = 'WTV_DIAGNOSTICS'
+DIAGNOSTICS_QUERY_PARAM = 'diagnostics'
+LOGGER_NAME = 'wind_temp_visualizer.diagnostics'
+_TRUTHY = {'1', 'true', 'yes', 'on'}
+
+
+def diagnostics_requested(environ, query_params=None):
+    """True when WTV_DIAGNOSTICS or the ?diagnostics= query parameter is set to 1/true/yes/on."""
+    values = [environ.get(DIAGNOSTICS_ENV_VAR, '')]
+    if query_params is not None: values.append(query_params.get(DIAGNOSTICS_QUERY_PARAM, ''))
+    return any(str(value).strip().lower() in _TRUTHY for value in values)
+
+
+def get_logger():
+    """The diagnostics logger; prints bare JSON lines to stderr unless logging was configured elsewhere."""
+    log = logging.getLogger(LOGGER_NAME)
+    if not log.handlers and not logging.getLogger().handlers:
+        handler = logging.StreamHandler(); handler.setFormatter(logging.Formatter('%(message)s'))
+        log.addHandler(handler); log.setLevel(logging.INFO); log.propagate = False
+    return log
+
+
+class RerunDiagnostics:
+    """Collects one rerun's stage timings, figure payload sizes and stage-cache hits.
+
+    Disabled instances are no-ops, so call sites stay unconditional. Per-station stages
+    (`station_trace:<digest>`) are aggregated under their prefix.
+    """
+
+    def __init__(self, enabled=True, session_id=None, rerun=None):
+        self.enabled = enabled
+        self.session_id, self.rerun = session_id, rerun
+        self.stage_seconds = {}
+        self.cache_hits, self.cache_misses = {}, {}
+        self.figure_bytes = {}
+        self.fields = {}
+        self._start = time.perf_counter()
+
+    @contextmanager
+    def stage(self, name):
+        """Times the enclosed block; repeated stages of the same name add up."""
+        if not self.enabled: yield; return
+        start = time.perf_counter()
+        try: yield
+        finally:
+            name = name.split(':', 1)[0]
+            self.stage_seconds[name] = self.stage_seconds.get(name, 0.0) + time.perf_counter() - start
+
+    def record_cache(self, stage, hit):
+        """Counts one StageCache lookup."""
+        if not self.enabled: return
+        counts = self.cache_hits if hit else self.cache_misses
+        stage = stage.split(':', 1)[0]
+        counts[stage] = counts.get(stage, 0) + 1
+
+    def record_figure(self, name, fig):
+        """Serializes `fig` the way st.plotly_chart does and records the byte size (the time goes to `serialize`)."""
+        if not self.enabled: return
+        with self.stage('serialize'): payload = pio.to_json(fig, validate=False)
+        self.figure_bytes[name] = self.figure_bytes.get(name, 0) + len(payload.encode('utf-8'))
+
+    def record(self, **fields):
+        """Adds free-form fields (record counts, render mode, store stats...) to the log line."""
+        if self.enabled: self.fields.update(fields)
+
+    def as_record(self):
+        """The rerun as a JSON-serializable dict; `untracked_ms` is widget and script time outside any stage."""
+        total = time.perf_counter() - self._start
+        return dict(
+            event='rerun', ts=round(time.time(), 3), session=self.session_id, rerun=self.rerun, total_ms=round(total * 1e3, 2),
+            stages_ms={name: round(seconds * 1e3, 2) for name, seconds in self.stage_seconds.items()},
+            untracked_ms=round((total - sum(self.stage_seconds.values())) * 1e3, 2),
+            figure_bytes=self.figure_bytes, cache_hits=self.cache_hits, cache_misses=self.cache_misses, **self.fields,
+        )
+
+    def emit(self, logger=None):
+        """Logs the rerun as one JSON line and returns the record (None when disabled)."""
+        if not self.enabled: return None
+        record = self.as_record()
+        (logger or get_logger()).info(json.dumps(record, sort_keys=True, default=str))
+        return record
@@ -0,0 +1,76 @@
+"""In-memory EPW parser that only materializes the columns the app needs."""
+
+import io
+
+import numpy as np
+import pandas as pd
+
+from .compact import CompactDataset
+
+# --- EPW Layout (same names as pvlib.iotools.read_epw) ---
+EPW_HEADER_FIELDS = ['loc', 'city', 'state-prov', 'country', 'data_type', 'WMO_code', 'latitude', 'longitude', 'TZ', 'altitude']
+EPW_COLUMNS = ['year', 'month', 'day', 'hour', 'minute', 'data_source_unct',
+               'temp_air', 'temp_dew', 'relative_humidity',
+               'atmospheric_pressure', 'etr', 'etrn', 'ghi_infrared', 'ghi',
+               'dni', 'dhi', 'global_hor_illum', 'direct_normal_illum',
+               'diffuse_horizontal_illum', 'zenith_luminance',
+               'wind_direction', 'wind_speed', 'total_sky_cover',
+               'opaque_sky_cover', 'visibility', 'ceiling_height',
+               'present_weather_observation', 'present_weather_codes',
+               'precipitable_water', 'aerosol_optical_depth', 'snow_depth',
+               'days_since_last_snowfall', 'albedo',
+               'liquid_precipitation_depth', 'liquid_precipitation_quantity']
+EPW_HEADER_LINES = 8
+_TIME_COLUMNS = ['year', 'month', 'day', 'hour']
+
+
+def _split_header(content):
+    """Returns the 8 decoded header lines and the byte offset where the data rows start."""
+    lines, offset = [], 0
+    for _ in range(EPW_HEADER_LINES):
+        end = content.find(b'\n', offset)
+        if end < 0: raise ValueError("EPW file ends before the 8 header lines are complete")
+        lines.append(content[offset:end].decode('utf-8', errors='replace').rstrip('\r'))
+        offset = end + 1
+    return lines, offset
+
+
+def parse_epw_header(first_line):
+    """Parses the LOCATION line into the same metadata dict pvlib returns."""
+    meta = dict(zip(EPW_HEADER_FIELDS, first_line.split(',')))
+    for key in ('altitude', 'latitude', 'longitude', 'TZ'): meta[key] = float(meta[key])
+    return meta
+
+
+def _records_per_hour(data_periods_line):
+    """Reads the records-per-hour field of the DATA PERIODS line (1 for hourly files)."""
+    try: return max(int(data_periods_line.split(',')[2]), 1)
+    except (IndexError, ValueError): return 1
+
+
+def read_epw_bytes(content, columns=('temp_air', 'wind_speed')):
+    """Parses raw EPW bytes into a (data, meta) pair holding only the requested columns."""
+    unknown = [col for col in columns if col not in EPW_COLUMNS]
+    if unknown: raise ValueError(f"Unknown EPW columns requested: {unknown}")
+    header, data_start = _split_header(content)
+    meta = parse_epw_header(header[0])
+
+    # Single C-level pass over the data block, skipping every column we do not keep
+    wanted = sorted({EPW_COLUMNS.index(col) for col in list(_TIME_COLUMNS) + list(columns)})
+    raw = pd.read_csv(io.BytesIO(content[data_start:]), header=None, usecols=wanted, names=[EPW_COLUMNS[i] for i in wanted], engine='c', on_bad_lines='skip')
+
+    # Build the index from integer arrays instead of per-row string concatenation
+    records_per_hour = _records_per_hour(header[7])
+    stamps = pd.to_datetime(pd.DataFrame({'year': raw['year'], 'month': raw['month'], 'day': raw['day']})).to_numpy()
+    offsets = (raw['hour'].to_numpy(dtype=np.int64) - 1) * 60
+    if records_per_hour > 1: offsets = offsets + (np.arange(len(raw)) % records_per_hour) * (60 // records_per_hour)
+    index = pd.DatetimeIndex(stamps + offsets.astype('timedelta64[m]')).tz_localize(int(meta['TZ'] * 3600))
+
+    data = pd.DataFrame({col: pd.to_numeric(raw[col], errors='coerce').to_numpy(dtype=np.float64) for col in columns}, index=index)
+    return data, meta
+
+
+def load_station(content):
+    """The app's load path: EPW bytes -> (CompactDataset, meta), rows missing temp_air or wind_speed dropped (raises on bad files)."""
+    data, meta = read_epw_bytes(content, columns=('temp_air', 'wind_speed'))
+    return CompactDataset.from_frame(data.dropna(subset=['temp_air', 'wind_speed'])), meta
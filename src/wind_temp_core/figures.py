@@ -0,0 +1,176 @@
+"""Plotly figure construction, split into cached trace arrays and a cheap layout stage."""
+
+import math
+
+import numpy as np
+import plotly.colors
+import plotly.graph_objects as go
+from plotly.subplots import make_subplots
+
+# --- Defaults (mirror the sidebar defaults of the Streamlit app) ---
+DEFAULT_CHART_OPTIONS = dict(
+    width=1200, height=900,
+    font_size=18, font_color='#000000', bg_color='#FFFFFF', transparent_bg=False,
+    colorscale='RdYlBu_r', colorbar_length=0.8, colorbar_title="Temp (°C)", cmin=None, cmax=None,
+    show_comfort_band=True, comfort_min=18.0, comfort_max=32.0, comfort_rgba='rgba(144, 238, 144, 0.25)',
+    comfort_align='Center', comfort_ypos=0.95, comfort_scope='the year', annotation_align='Left', annotation_yshift=15,
+)
+# Hover time is assembled in the browser from the uint8 parts of `hover_time_parts` (YYYY-MM-DD HH:MM)
+HOVER_TIME_TEMPLATE = "%{customdata[0]}%{customdata[1]:02d}-%{customdata[2]:02d}-%{customdata[3]:02d} %{customdata[4]:02d}:%{customdata[5]:02d}"
+SCATTER_HOVERTEMPLATE = "<b>Time:</b> " + HOVER_TIME_TEMPLATE + "<br><b>Temp:</b> %{x:.1f} °C<br><b>Wind Speed:</b> %{y:.1f} m/s<extra></extra>"
+PLOT_DTYPE = np.float32  # x / y / colour arrays are sent as float32 typed arrays (half the bytes of float64)
+DENSITY_COLORAXIS = 'coloraxis2'  # Record-count scale of density panels in a grid, kept apart from the temperature coloraxis
+
+
+def hex_to_rgba(hex_color, alpha=0.2):
+    """Converts a hex color string to an RGBA string."""
+    try:
+        hex_color = hex_color.lstrip('#')
+        if len(hex_color) == 3: hex_color = "".join([c*2 for c in hex_color])
+        if len(hex_color) != 6: raise ValueError("Invalid hex color length")
+        rgb = tuple(int(hex_color[i:i+2], 16) for i in (0, 2, 4))
+        return f'rgba({rgb[0]}, {rgb[1]}, {rgb[2]}, {alpha})'
+    except Exception:
+        return f'rgba(0, 255, 0, {alpha})' # Fallback to default green
+
+
+def default_axis_limits(temp_air, wind_speed):
+    """Initial (x_range, y_range): the data extent plus a small buffer, wind speed floored at 0."""
+    x_min_data, x_max_data = float(np.min(temp_air)), float(np.max(temp_air))
+    y_min_data_orig, y_max_data_orig = float(np.min(wind_speed)), float(np.max(wind_speed))
+    x_buffer = max((x_max_data - x_min_data) * 0.05, 1.0)
+    y_buffer_orig = max((y_max_data_orig - y_min_data_orig) * 0.05, 0.5)
+    x_range = (float(round(x_min_data - x_buffer)), float(round(x_max_data + x_buffer)))
+    y_range = (max(0.0, round(y_min_data_orig - y_buffer_orig, 1)), round(y_max_data_orig + y_buffer_orig, 1))
+    return x_range, y_range
+
+
+def hover_time_parts(index):
+    """Per-record [century, year % 100, month, day, hour, minute] as an (n, 6) uint8 array (callers cache it per dataset).
+
+    Sent as a binary customdata array and formatted client-side by HOVER_TIME_TEMPLATE: 6 bytes per
+    record instead of a 16-character string held per session and repeated in the JSON payload.
+    """
+    year = np.asarray(index.year)
+    return np.column_stack([year // 100, year % 100, index.month, index.day, index.hour, index.minute]).astype(np.uint8)
+
+
+# --- Trace Stage (depends on data and marker style only) ---
+def scatter_trace(temp_air, wind_speed, time_parts, marker_size=4, use_outline=False):
+    """Builds the scatter trace as a plain dict; colors come from the shared layout coloraxis."""
+    temp_air, wind_speed = np.asarray(temp_air, dtype=PLOT_DTYPE), np.asarray(wind_speed, dtype=PLOT_DTYPE)
+    outline_width = 1.5 if use_outline else 0.5; filled_marker_line_color = 'rgba(0,0,0,0.4)'
+    if use_outline: marker = dict(size=marker_size, color='rgba(0,0,0,0)', line=dict(width=outline_width, color=temp_air, coloraxis='coloraxis'))
+    else: marker = dict(size=marker_size, color=temp_air, coloraxis='coloraxis', line=dict(width=outline_width, color=filled_marker_line_color))
+    return dict(type='scattergl', x=temp_air, y=wind_speed, mode='markers', marker=marker, customdata=time_parts, hovertemplate=SCATTER_HOVERTEMPLATE)
+
+
+def station_trace(temp_air, wind_speed, time_parts, name, color, marker_size=3):
+    """Single-color scatter trace for one station in an overlaid comparison."""
+    return dict(type='scattergl', x=np.asarray(temp_air, dtype=PLOT_DTYPE), y=np.asarray(wind_speed, dtype=PLOT_DTYPE), mode='markers', name=name, marker=dict(size=marker_size, color=color, opacity=0.6),
+                customdata=time_parts, hovertemplate=SCATTER_HOVERTEMPLATE.replace("<extra></extra>", "<extra>%{fullData.name}</extra>"))
+
+
+def station_colors(n):
+    """n distinct qualitative colors (cycled past the palette length)."""
+    palette = plotly.colors.qualitative.Dark24
+    return [palette[i % len(palette)] for i in range(n)]
+
+
+# --- Layout Stage (cosmetic options only, no per-row work) ---
+def _colorbar_config(opts, title):
+    return dict(title=title, len=opts['colorbar_length'], title_font=dict(size=opts['font_size'], color=opts['font_color']), tickfont=dict(size=opts['font_size'], color=opts['font_color']))
+
+
+def _apply_base_layout(fig, opts):
+    """Size, fonts, background, axis ranges and the shared temperature coloraxis."""
+    font_size, font_color = opts['font_size'], opts['font_color']
+
+    # --- Determine Background Colors ---
+    if opts['transparent_bg']: plot_bg_to_use, paper_bg_to_use = ('rgba(0,0,0,0)', 'rgba(0,0,0,0)')
+    else: plot_bg_to_use = opts['bg_color']; paper_bg_to_use = opts['bg_color']
+
+    colorbar_config = _colorbar_config(opts, opts['colorbar_title'])
+    fig.update_layout(
+        width=opts['width'], height=opts['height'],
+        font=dict(size=font_size, color=font_color), # Global Default
+        plot_bgcolor=plot_bg_to_use, paper_bgcolor=paper_bg_to_use,
+        coloraxis=dict(colorscale=opts['colorscale'], cmin=opts['cmin'], cmax=opts['cmax'], showscale=True, colorbar=colorbar_config),
+        margin=dict(l=50, r=50, t=50, b=50)
+    )
+    fig.update_xaxes(range=list(opts['x_range']), title_font=dict(size=font_size, color=font_color), tickfont=dict(size=font_size, color=font_color))
+    fig.update_yaxes(range=list(opts['y_range']), title_font=dict(size=font_size, color=font_color), tickfont=dict(size=font_size, color=font_color))
+
+
+def build_figure(traces, stats, options):
+    """Wraps prebuilt trace dicts in a styled figure with the comfort band and statistics annotations.
+
+    `options` overrides DEFAULT_CHART_OPTIONS and must include `x_range` and `y_range`.
+    """
+    opts = dict(DEFAULT_CHART_OPTIONS, **options)
+    font_size, font_color = opts['font_size'], opts['font_color']
+    x_min_limit, x_max_limit = opts['x_range']
+
+    fig = go.Figure(data=traces)
+    _apply_base_layout(fig, opts)
+    fig.update_layout(xaxis_title='Dry Bulb Temperature (°C)', yaxis_title='Wind Speed (m/s)')
+
+    # --- Add Comfort Band Shape (Conditional)---
+    actual_comfort_min = min(opts['comfort_min'], opts['comfort_max'])
+    actual_comfort_max = max(opts['comfort_min'], opts['comfort_max'])
+    if opts['show_comfort_band']:
+        fig.add_shape(type="rect", xref="x", yref="paper", x0=actual_comfort_min, y0=0, x1=actual_comfort_max, y1=1, fillcolor=opts['comfort_rgba'], line_width=0, layer="below")
+
+    # --- Add Lines and Annotations for Stats ---
+    if stats is not None:
+        avg_wsp, p95_wsp = stats['avg'], stats['p95']
+        x_range_width = x_max_limit - x_min_limit
+        annotation_x_stat = x_min_limit; x_anchor_stat = 'left'; x_shift_stat = 10
+        if opts['annotation_align'] == 'Center': annotation_x_stat = x_min_limit + x_range_width * 0.5; x_anchor_stat = 'center'; x_shift_stat = 0
+        elif opts['annotation_align'] == 'Right': annotation_x_stat = x_max_limit; x_anchor_stat = 'right'; x_shift_stat = -10
+        annotation_font = dict(size=font_size, color=font_color); annotation_bgcolor = 'rgba(255,255,255,0.6)'
+        fig.add_hline(y=avg_wsp, line_dash="dash", line_color=font_color, opacity=0.7)
+        fig.add_annotation(x=annotation_x_stat, y=avg_wsp, text=f"Average Wind Speed [{avg_wsp:.1f}] m/s", showarrow=False, yshift=opts['annotation_yshift'], font=annotation_font, bgcolor=annotation_bgcolor, xanchor=x_anchor_stat, xshift=x_shift_stat)
+        fig.add_hline(y=p95_wsp, line_dash="dot", line_color=font_color, opacity=0.7)
+        fig.add_annotation(x=annotation_x_stat, y=p95_wsp, text=f"95th Percentile [{p95_wsp:.1f}] m/s", showarrow=False, yshift=opts['annotation_yshift'], font=annotation_font, bgcolor=annotation_bgcolor, xanchor=x_anchor_stat, xshift=x_shift_stat)
+        for q, value in stats.get('extra_percentiles', ()):
+            fig.add_hline(y=value, line_dash="dashdot", line_color=font_color, opacity=0.5)
+            fig.add_annotation(x=annotation_x_stat, y=value, text=f"P{q:g} [{value:.1f}] m/s", showarrow=False, yshift=opts['annotation_yshift'], font=annotation_font, bgcolor=annotation_bgcolor, xanchor=x_anchor_stat, xshift=x_shift_stat)
+
+        # Comfort Band Annotation (Conditional)
+        if opts['show_comfort_band'] and actual_comfort_max > actual_comfort_min:
+            comfort_annotation_x = actual_comfort_min; comfort_x_anchor = 'left'; comfort_x_shift = 5
+            if opts['comfort_align'] == 'Center': comfort_annotation_x = actual_comfort_min + (actual_comfort_max - actual_comfort_min) * 0.5; comfort_x_anchor = 'center'; comfort_x_shift = 0
+            elif opts['comfort_align'] == 'Right': comfort_annotation_x = actual_comfort_max; comfort_x_anchor = 'right'; comfort_x_shift = -5
+            comfort_text = f"Comfort Band<br>{stats['comfort_pct']:.1f}% of {opts['comfort_scope']}"
+            fig.add_annotation(x=comfort_annotation_x, yref="paper", y=opts['comfort_ypos'], text=comfort_text, showarrow=False, font=annotation_font, bgcolor=annotation_bgcolor, align="center", xanchor=comfort_x_anchor, xshift=comfort_x_shift, yanchor="middle")
+    return fig
+
+
+def build_small_multiples(traces, titles, options, cols=4):
+    """Grid of one panel per station with shared axis ranges; `options` as for `build_figure`.
+
+    Scatter panels are colored by temperature on `coloraxis`; density panels (traces on DENSITY_COLORAXIS)
+    get their own record-count scale and colorbar.
+    """
+    opts = dict(DEFAULT_CHART_OPTIONS, **options)
+    rows = max(1, math.ceil(len(traces) / cols))
+    grid = make_subplots(rows=rows, cols=cols, shared_xaxes=True, shared_yaxes=True, subplot_titles=titles, horizontal_spacing=0.02, vertical_spacing=0.3 / rows)
+    # Point each trace at its panel's axes directly; fig.add_trace(row=, col=) re-validates every trace and costs ~50 ms each
+    grid.update_xaxes(title_text='Dry Bulb Temperature (°C)', row=rows); grid.update_yaxes(title_text='Wind Speed (m/s)', col=1)
+    if opts['show_comfort_band']:
+        grid.add_vrect(x0=min(opts['comfort_min'], opts['comfort_max']), x1=max(opts['comfort_min'], opts['comfort_max']), fillcolor=opts['comfort_rgba'], line_width=0, layer="below", row='all', col='all', exclude_empty_subplots=False)
+    axis_refs = [grid.get_subplot(i // cols + 1, i % cols + 1) for i in range(len(traces))]
+    fig = go.Figure(data=[dict(trace, xaxis=ref.xaxis.plotly_name.replace('axis', ''), yaxis=ref.yaxis.plotly_name.replace('axis', '')) for trace, ref in zip(traces, axis_refs)], layout=grid.layout)
+    _apply_base_layout(fig, opts)
+    if any(trace.get('coloraxis') == DENSITY_COLORAXIS for trace in traces):
+        both_scales = any(trace.get('coloraxis') != DENSITY_COLORAXIS for trace in traces)
+        density_colorbar = dict(_colorbar_config(opts, "Records"), x=1.12) if both_scales else _colorbar_config(opts, "Records")  # Beside the temperature colorbar
+        fig.update_layout({DENSITY_COLORAXIS: dict(colorscale=opts['colorscale'], showscale=True, colorbar=density_colorbar)})
+    fig.update_annotations(font=dict(size=opts['font_size'], color=opts['font_color']))  # Subplot titles
+    return fig
+
+
+def download_config(city, width, height, scale):
+    """Plotly config for the PNG download button."""
+    return {'toImageButtonOptions': {'format': 'png', 'filename': f"epw_plot_{city.replace(' ','_')}", 'height': height, 'width': width, 'scale': scale}, 'displaylogo': False}
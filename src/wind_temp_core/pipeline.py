@@ -0,0 +1,30 @@
+"""Per-session memo of pipeline stages so a rerun only recomputes stages whose inputs changed."""
+
+
+class StageCache:
+    """Keeps the last (key, result) per stage name; `get` recomputes only when the key differs."""
+
+    def __init__(self):
+        self._slots = {}
+        self.hits = {}
+        self.misses = {}
+        self.diagnostics = None  # Optional RerunDiagnostics; set per rerun to time misses and count hits
+
+    def get(self, stage, key, compute):
+        """Returns the cached result of `stage` for `key`, calling `compute()` on a key change."""
+        slot = self._slots.get(stage)
+        if slot is not None and slot[0] == key:
+            self.hits[stage] = self.hits.get(stage, 0) + 1
+            if self.diagnostics is not None: self.diagnostics.record_cache(stage, True)
+            return slot[1]
+        self.misses[stage] = self.misses.get(stage, 0) + 1
+        if self.diagnostics is None: result = compute()
+        else:
+            self.diagnostics.record_cache(stage, False)
+            with self.diagnostics.stage(stage): result = compute()
+        self._slots[stage] = (key, result)
+        return result
+
+    def prune(self, keep):
+        """Forgets every stage whose name fails `keep(name)` (e.g. per-station stages of removed files)."""
+        for stage in [name for name in self._slots if not keep(name)]: del self._slots[stage]
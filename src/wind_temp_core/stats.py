@@ -0,0 +1,88 @@
+"""Summary statistics shown on the chart."""
+
+import numpy as np
+
+
+def _float_array(values):
+    """Floating arrays keep their dtype (float32 datasets stay float32); anything else becomes float64."""
+    values = np.asarray(values)
+    return values if values.dtype.kind == 'f' else values.astype(np.float64)
+
+
+class StatisticsIndex:
+    """Sorted copies of one dataset, built once, that answer the chart statistics without touching the rows.
+
+    The height adjustment is a scalar multiply, so the mean and every percentile of the adjusted wind
+    speed are the unadjusted values times the factor (O(1)); the comfort share is two binary searches
+    on the sorted temperatures (O(log n)).
+    """
+
+    def __init__(self, temp_air, wind_speed):
+        self._values = (_float_array(temp_air), _float_array(wind_speed))
+        self._set_sorted(np.sort(self._values[0]), np.sort(self._values[1]))
+
+    def _set_sorted(self, sorted_temp, sorted_wind):
+        self.sorted_temp, self.sorted_wind = sorted_temp, sorted_wind
+        self.size = self.sorted_wind.size
+        self.wind_mean = float(self.sorted_wind.mean(dtype=np.float64)) if self.size else 0.0
+
+    @property
+    def nbytes(self):
+        """Bytes held by the sorted copies (the arrays the index was built from belong to the dataset)."""
+        return self.sorted_temp.nbytes + self.sorted_wind.nbytes
+
+    def sort_orders(self):
+        """(temp, wind) int32 row positions in sorted order, for `subset` (built once per dataset; 4 bytes per record each)."""
+        if self._values is None: raise ValueError("sort_orders() needs an index built from the full arrays")
+        return tuple(np.argsort(values, kind='stable').astype(np.int32) for values in self._values)
+
+    def subset(self, mask, orders):
+        """Index over the rows where `mask` is True, filtered from the full sort orders in O(n) (no re-sort).
+
+        `mask` is aligned with the arrays this index was built from and `orders` is its `sort_orders()`;
+        a subset index cannot be subset again.
+        """
+        if self._values is None: raise ValueError("subset() needs an index built from the full arrays")
+        temp_order, wind_order = orders
+        index = StatisticsIndex.__new__(StatisticsIndex)
+        index._values = None
+        index._set_sorted(self.sorted_temp[mask[temp_order]], self.sorted_wind[mask[wind_order]])
+        return index
+
+    def mean_wind(self, factor=1.0):
+        """Mean adjusted wind speed."""
+        return self.wind_mean * factor
+
+    def wind_percentile(self, q, factor=1.0):
+        """q-th percentile (0-100) of the adjusted wind speed, linear interpolation like numpy's default."""
+        if self.size == 0: return 0.0
+        if factor < 0: q = 100.0 - q  # A negative factor reverses the order
+        position = (self.size - 1) * q / 100.0
+        lower = int(np.floor(position)); upper = min(lower + 1, self.size - 1)
+        value = self.sorted_wind[lower] + (self.sorted_wind[upper] - self.sorted_wind[lower]) * (position - lower)
+        return float(value) * factor
+
+    def exceedance_fraction(self, threshold, factor=1.0):
+        """Share (0-1) of records whose adjusted wind speed exceeds `threshold`; vectorized over array-like factors."""
+        factor = np.asarray(factor, dtype=np.float64)
+        if self.size == 0: return np.zeros_like(factor)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            cutoff = threshold / factor
+        above = self.size - np.searchsorted(self.sorted_wind, np.where(factor > 0, cutoff, np.inf), side='right')
+        below = np.searchsorted(self.sorted_wind, np.where(factor < 0, cutoff, -np.inf), side='left')  # factor < 0 flips the inequality
+        zero = np.where(threshold < 0, self.size, 0)
+        fraction = np.where(factor > 0, above, np.where(factor < 0, below, zero)) / self.size
+        return np.where(np.isnan(factor), np.nan, fraction)
+
+    def comfort_fraction(self, temp_min, temp_max):
+        """Share (0-1) of records with temp_min <= temp_air <= temp_max."""
+        if self.size == 0: return 0.0
+        as_stored = self.sorted_temp.dtype.type  # Compare in the stored precision, so 18.1 matches a float32 18.1
+        inside = np.searchsorted(self.sorted_temp, as_stored(temp_max), side='right') - np.searchsorted(self.sorted_temp, as_stored(temp_min), side='left')
+        return max(int(inside), 0) / self.size
+
+    def summary(self, factor, comfort_min, comfort_max, extra_percentiles=()):
+        """Average / 95th percentile / comfort % (plus any extra percentiles) for one set of sidebar inputs."""
+        return dict(avg=self.mean_wind(factor), p95=self.wind_percentile(95, factor), comfort_pct=self.comfort_fraction(comfort_min, comfort_max) * 100,
+                    extra_percentiles=[(q, self.wind_percentile(q, factor)) for q in extra_percentiles])
+
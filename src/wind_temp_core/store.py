@@ -0,0 +1,186 @@
+"""Bounded, content-addressed store for parsed EPW datasets shared across sessions."""
+
+import hashlib
+import json
+import math
+import os
+import tempfile
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+from .compact import CompactDataset
+
+DEFAULT_MAX_BYTES = 256 * 1024 * 1024
+DEFAULT_SPILL_MAX_BYTES = 2048 * 1024 * 1024
+MAX_MB_ENV_VAR, SPILL_MAX_MB_ENV_VAR = 'WTV_CACHE_MAX_MB', 'WTV_CACHE_DIR_MAX_MB'
+SPILL_FORMAT = 'v2'  # v2: CompactDataset arrays (v1 files held DataFrame columns and are ignored)
+
+
+def budget_from_env(environ, name, default):
+    """A budget given in MB by environ[name], in bytes; unset, non-numeric or non-positive values give `default`."""
+    try: megabytes = float(environ.get(name, ''))
+    except ValueError: return default
+    if not math.isfinite(megabytes) or megabytes <= 0: return default
+    return int(megabytes * 1024 * 1024)
+
+
+def content_digest(content):
+    """Returns a short hex digest identifying an upload by its bytes."""
+    return hashlib.blake2b(content, digest_size=16).hexdigest()
+
+
+def _nbytes(value):
+    """In-memory size of a dataset or derived structure (its `nbytes`, summed over tuples)."""
+    if isinstance(value, tuple): return sum(_nbytes(item) for item in value)
+    return int(getattr(value, 'nbytes', 0))
+
+
+class DatasetStore:
+    """Thread-safe LRU of (CompactDataset, meta) pairs with a byte budget and optional .npz spill directory.
+
+    The spill directory has its own budget (`spill_max_bytes`): after each write the least recently used
+    files are deleted until it fits. Unreadable spill files are deleted and count as misses.
+
+    Structures derived from a dataset (sorted statistics index, calendar codes...) are kept in the same
+    entry by `derived`, so every session shares one copy, its bytes count toward the budget and it is
+    evicted together with the dataset.
+    """
+
+    def __init__(self, max_bytes=DEFAULT_MAX_BYTES, spill_dir=None, spill_max_bytes=DEFAULT_SPILL_MAX_BYTES):
+        self.max_bytes = max_bytes
+        self.spill_dir, self.spill_max_bytes = spill_dir, spill_max_bytes
+        if spill_dir: os.makedirs(spill_dir, exist_ok=True)
+        self._entries = OrderedDict()  # digest -> [data, meta, nbytes, {name: derived structure}]
+        self._bytes = 0
+        self._lock = threading.RLock()
+        self.hits = self.misses = self.evictions = self.disk_hits = self.spill_evictions = 0
+
+    def __contains__(self, digest):
+        with self._lock: return digest in self._entries
+
+    def __len__(self):
+        with self._lock: return len(self._entries)
+
+    # --- Lookup / Insert ---
+    def get(self, digest):
+        """Returns the cached (data, meta) for a digest, or None on a miss."""
+        with self._lock:
+            entry = self._entries.get(digest)
+            if entry is not None:
+                self._entries.move_to_end(digest); self.hits += 1
+                return entry[0], entry[1]
+        spilled = self._read_spill(digest)
+        with self._lock:
+            if spilled is None: self.misses += 1; return None
+            self.disk_hits += 1
+            self._insert(digest, *spilled)
+        return spilled
+
+    def put(self, digest, data, meta):
+        """Caches a parsed dataset, evicting least-recently-used entries past the byte budget."""
+        with self._lock: self._insert(digest, data, meta)
+        self._write_spill(digest, data, meta)
+
+    def get_or_load(self, digest, loader):
+        """Returns the cached dataset or calls `loader()` and caches its result (None results are not cached)."""
+        cached = self.get(digest)
+        if cached is not None: return cached
+        data, meta = loader()
+        if data is not None: self.put(digest, data, meta)
+        return data, meta
+
+    def derived(self, digest, name, build):
+        """Returns the structure `name` derived from a cached dataset, calling `build()` only the first time.
+
+        The result is kept with the dataset and its `nbytes` counts toward the budget. A digest that is not
+        (or no longer) cached is built but not kept.
+        """
+        with self._lock:
+            entry = self._entries.get(digest)
+            if entry is not None and name in entry[3]:
+                self._entries.move_to_end(digest)
+                return entry[3][name]
+        value = build()
+        with self._lock:
+            entry = self._entries.get(digest)
+            if entry is None: return value
+            if name in entry[3]: return entry[3][name]  # Built concurrently by another session; keep the first
+            entry[3][name] = value
+            nbytes = _nbytes(value); entry[2] += nbytes; self._bytes += nbytes
+            self._entries.move_to_end(digest); self._evict()
+        return value
+
+    def _insert(self, digest, data, meta):
+        if digest in self._entries: self._bytes -= self._entries.pop(digest)[2]
+        nbytes = _nbytes(data)
+        self._entries[digest] = [data, meta, nbytes, {}]; self._bytes += nbytes
+        self._evict()
+
+    def _evict(self):
+        # Always keep the newest entry, even if it alone exceeds the budget
+        while self._bytes > self.max_bytes and len(self._entries) > 1:
+            _, (_, _, evicted_bytes, _) = self._entries.popitem(last=False)
+            self._bytes -= evicted_bytes; self.evictions += 1
+
+    def clear(self):
+        """Drops every in-memory entry (spilled files are kept)."""
+        with self._lock: self._entries.clear(); self._bytes = 0
+
+    def stats(self):
+        """Counters for sizing the store."""
+        with self._lock:
+            lookups = self.hits + self.disk_hits + self.misses
+            return {'entries': len(self._entries), 'bytes': self._bytes, 'max_bytes': self.max_bytes,
+                    'hits': self.hits, 'disk_hits': self.disk_hits, 'misses': self.misses, 'evictions': self.evictions, 'spill_evictions': self.spill_evictions,
+                    'hit_rate': (self.hits + self.disk_hits) / lookups if lookups else 0.0}
+
+    # --- On-Disk Spill (.npz, so restarts start warm) ---
+    def _spill_path(self, digest):
+        return os.path.join(self.spill_dir, f"{digest}.{SPILL_FORMAT}.npz")
+
+    def _write_spill(self, digest, data, meta):
+        if not self.spill_dir or os.path.exists(self._spill_path(digest)): return
+        arrays = {f"data_{key}": value for key, value in data.to_arrays().items()}
+        arrays['meta_json'] = np.array(json.dumps({'meta': meta}))
+        fd, tmp_path = tempfile.mkstemp(dir=self.spill_dir, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as f: np.savez(f, **arrays)
+            os.replace(tmp_path, self._spill_path(digest))  # Atomic, so concurrent readers never see half a file
+        except OSError:
+            if os.path.exists(tmp_path): os.remove(tmp_path)
+            return
+        self._trim_spill()
+
+    def _read_spill(self, digest):
+        if not self.spill_dir: return None
+        path = self._spill_path(digest)
+        if not os.path.exists(path): return None
+        try:
+            with np.load(path) as npz:
+                info = json.loads(str(npz['meta_json']))
+                data = CompactDataset.from_arrays({key[len('data_'):]: npz[key] for key in npz.files if key.startswith('data_')})
+        except Exception:  # Truncated or corrupt file (BadZipFile, EOFError, missing arrays...): drop it so the upload is parsed again
+            self._remove_spill(path); return None
+        try: os.utime(path)  # The modification time is the recency the directory budget evicts by
+        except OSError: pass
+        return data, info['meta']
+
+    def _remove_spill(self, path):
+        try: os.remove(path)
+        except OSError: pass  # Already removed by another process
+
+    def _trim_spill(self):
+        """Deletes the least recently used spill files until the directory fits `spill_max_bytes` (the newest file is kept)."""
+        if self.spill_max_bytes is None: return
+        files = []
+        for entry in os.scandir(self.spill_dir):
+            if not entry.name.endswith(f".{SPILL_FORMAT}.npz"): continue
+            try: stat = entry.stat(); files.append((stat.st_mtime, stat.st_size, entry.path))
+            except OSError: pass
+        total = sum(size for _, size, _ in files)
+        for _, size, path in sorted(files)[:-1]:
+            if total <= self.spill_max_bytes: break
+            self._remove_spill(path); total -= size
+            with self._lock: self.spill_evictions += 1
@@ -0,0 +1,54 @@
+"""Vectorized log-law sensitivity sweep over grids of heights and roughness lengths."""
+
+import numpy as np
+import pandas as pd
+import plotly.graph_objects as go
+
+SWEEP_METRICS = {'avg_wind': "Average Wind Speed (m/s)", 'p95_wind': "95th Percentile Wind Speed (m/s)"}
+
+
+def log_law_factor_grid(reference_height, site_height, roughness_station, roughness_site):
+    """Array version of `log_law_factor`; inputs broadcast against each other and unusable cells are NaN."""
+    reference_height, site_height, roughness_station, roughness_site = np.broadcast_arrays(
+        *(np.asarray(v, dtype=np.float64) for v in (reference_height, site_height, roughness_station, roughness_site)))
+    valid = (reference_height > 0) & (site_height > 0) & (roughness_station > 0) & (roughness_site > 0)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        log_den = np.log(reference_height / roughness_station)
+        factor = np.log(site_height / roughness_site) / log_den
+    return np.where(valid & (np.abs(log_den) >= 1e-9), factor, np.nan)
+
+
+def sensitivity_sweep(stats_index, reference_heights, site_heights, roughness_stations, roughness_sites, thresholds=(5.0,)):
+    """Evaluates every (ref height, site height, station roughness, site roughness) combination in one pass.
+
+    Each argument is a scalar or 1-D array; the result is a long-form DataFrame with one row per
+    combination holding the factor, average / P95 wind speed and the share of records above each threshold.
+    """
+    axes = [np.atleast_1d(np.asarray(v, dtype=np.float64)) for v in (reference_heights, site_heights, roughness_stations, roughness_sites)]
+    grids = np.meshgrid(*axes, indexing='ij')
+    factor = log_law_factor_grid(*grids)
+
+    # Adjusted statistics are linear in the factor, so the per-dataset index answers every cell at once
+    p95_pos, p95_neg = stats_index.wind_percentile(95), stats_index.wind_percentile(5)
+    result = pd.DataFrame({
+        'reference_height': grids[0].ravel(), 'site_height': grids[1].ravel(),
+        'roughness_station': grids[2].ravel(), 'roughness_site': grids[3].ravel(),
+        'factor': factor.ravel(),
+        'avg_wind': (stats_index.wind_mean * factor).ravel(),
+        'p95_wind': (np.where(factor < 0, p95_neg, p95_pos) * factor).ravel(),
+    })
+    for threshold in thresholds:
+        result[f"exceed_{threshold:g}_pct"] = stats_index.exceedance_fraction(threshold, factor).ravel() * 100
+    return result
+
+
+def sweep_heatmap(result, metric, font_size=14, colorscale='Viridis'):
+    """Heatmap of one sweep metric over site height (x) and site roughness (y, log scale)."""
+    table = result.pivot_table(index='roughness_site', columns='site_height', values=metric, aggfunc='mean')
+    label = SWEEP_METRICS.get(metric, metric.replace('exceed_', 'Share above ').replace('_pct', ' m/s (%)'))
+    fig = go.Figure(go.Heatmap(
+        x=table.columns.to_numpy(), y=table.index.to_numpy(), z=table.to_numpy(), colorscale=colorscale, colorbar=dict(title=label),
+        hovertemplate="<b>Site Height:</b> %{x:.1f} m<br><b>Site Roughness:</b> %{y:.3f} m<br><b>Value:</b> %{z:.2f}<extra></extra>",
+    ))
+    fig.update_layout(xaxis_title="Desired Site Height (m)", yaxis_title="Ground Roughness (Site)", yaxis_type='log', font=dict(size=font_size), margin=dict(l=50, r=50, t=30, b=50))
+    return fig
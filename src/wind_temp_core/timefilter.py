@@ -0,0 +1,63 @@
+"""Month / hour / weekday codes built once per dataset, and bitmask selection of seasonal or diurnal subsets."""
+
+import numpy as np
+
+MONTH_NAMES = ['Jan', 'Feb', 'Mar', 'Apr', 'May', 'Jun', 'Jul', 'Aug', 'Sep', 'Oct', 'Nov', 'Dec']
+WEEKDAY_NAMES = ['Mon', 'Tue', 'Wed', 'Thu', 'Fri', 'Sat', 'Sun']
+SEASONS = {
+    'All Year': tuple(range(1, 13)),
+    'Winter (Dec-Feb)': (12, 1, 2), 'Spring (Mar-May)': (3, 4, 5), 'Summer (Jun-Aug)': (6, 7, 8), 'Autumn (Sep-Nov)': (9, 10, 11),
+}
+ALL_MONTHS, ALL_HOURS, ALL_WEEKDAYS = (1 << 12) - 1, (1 << 24) - 1, (1 << 7) - 1
+_CELLS = 12 * 7 * 24
+
+
+def month_bits(months):
+    """12-bit mask from month numbers 1-12."""
+    return sum(1 << (int(m) - 1) for m in set(months))
+
+
+def hour_bits(start, end):
+    """24-bit mask of the hours h with start <= h < end (e.g. 8, 18 for 08:00-18:00)."""
+    return sum(1 << h for h in range(max(int(start), 0), min(int(end), 24)))
+
+
+def weekday_bits(weekdays):
+    """7-bit mask from weekday numbers 0 (Monday) - 6 (Sunday)."""
+    return sum(1 << int(d) for d in set(weekdays))
+
+
+class CalendarIndex:
+    """Compact calendar codes of one dataset, so a filter change never touches datetimes again.
+
+    Each record gets one uint16 cell code for its (month, weekday, hour) combination (2016 cells);
+    the codes are all that is kept (2 bytes per record).
+    A filter expands its three bitmasks into a 2016-entry lookup table, and the row mask is a single
+    gather through that table. Record counts per cell are kept too, so the size of a subset is
+    known without building the mask.
+    """
+
+    def __init__(self, index):
+        month, weekday, hour = (np.asarray(field, dtype=np.uint16) for field in (index.month, index.dayofweek, index.hour))
+        self.cell = ((month - 1) * 7 + weekday) * 24 + hour
+        self.cell_counts = np.bincount(self.cell, minlength=_CELLS)
+        self.size = self.cell.size
+
+    @property
+    def nbytes(self):
+        return self.cell.nbytes + self.cell_counts.nbytes
+
+    @staticmethod
+    def _cell_table(months=ALL_MONTHS, hours=ALL_HOURS, weekdays=ALL_WEEKDAYS):
+        """Boolean (month, weekday, hour) table flattened to cell order."""
+        m = (months >> np.arange(12)) & 1; d = (weekdays >> np.arange(7)) & 1; h = (hours >> np.arange(24)) & 1
+        return (m[:, None, None] & d[None, :, None] & h[None, None, :]).astype(bool).ravel()
+
+    def mask(self, months=ALL_MONTHS, hours=ALL_HOURS, weekdays=ALL_WEEKDAYS):
+        """Boolean row mask of the records inside the filter, or None when the filter keeps everything."""
+        if months & ALL_MONTHS == ALL_MONTHS and hours & ALL_HOURS == ALL_HOURS and weekdays & ALL_WEEKDAYS == ALL_WEEKDAYS: return None
+        return self._cell_table(months, hours, weekdays)[self.cell]
+
+    def count(self, months=ALL_MONTHS, hours=ALL_HOURS, weekdays=ALL_WEEKDAYS):
+        """Number of records inside the filter (from the per-cell counts, no row pass)."""
+        return int(self.cell_counts[self._cell_table(months, hours, weekdays)].sum())
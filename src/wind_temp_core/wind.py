@@ -0,0 +1,13 @@
+"""Log-law wind speed height/roughness adjustment."""
+
+import math
+
+
+def log_law_factor(reference_height, site_height, roughness_station, roughness_site):
+    """Returns (factor, warning) scaling station wind speed to the site; factor is 1.0 with a warning when inputs are unusable."""
+    valid_inputs = (site_height > 0 and roughness_site > 0 and reference_height > 0 and roughness_station > 0 and site_height / roughness_site > 0 and reference_height / roughness_station > 0)
+    if not valid_inputs: return 1.0, "Invalid height/roughness values for wind adjustment."
+    log_arg_num = site_height / roughness_site; log_arg_den = reference_height / roughness_station
+    if abs(log_arg_den - 1.0) < 1e-9 or abs(math.log(log_arg_den)) < 1e-9: return 1.0, "Wind adj. failed: Log ratio denominator near zero."
+    log_num = math.log(log_arg_num) if abs(log_arg_num - 1.0) > 1e-9 else 0.0; log_den = math.log(log_arg_den)
+    return log_num / log_den, None
@@ -1,77 +1,237 @@
 import streamlit as st
 import pandas as pd
 import plotly.express as px
-import plotly.graph_objects as go
-import plotly.colors
-from pvlib.iotools import read_epw
-import io
 import os
-import math # Needed for wind speed calculation (log)
+import uuid
 import numpy as np # For percentile calculation if needed
+from concurrent.futures import ThreadPoolExecutor
+from wind_temp_core import load_station
+from wind_temp_core.diagnostics import RerunDiagnostics, diagnostics_requested
+from wind_temp_core.density import MIN_DENSITY_THRESHOLD, bin_density, density_heatmap_trace, density_threshold_from_env, use_density_mode
+from wind_temp_core.figures import DENSITY_COLORAXIS, build_figure, build_small_multiples, default_axis_limits, download_config, hex_to_rgba, hover_time_parts, scatter_trace, station_colors, station_trace
+from wind_temp_core.pipeline import StageCache
+from wind_temp_core.stats import StatisticsIndex
+from wind_temp_core.timefilter import MONTH_NAMES, SEASONS, WEEKDAY_NAMES, CalendarIndex, hour_bits, month_bits, weekday_bits
+from wind_temp_core.sweep import SWEEP_METRICS, sensitivity_sweep, sweep_heatmap
+from wind_temp_core.store import DEFAULT_MAX_BYTES, DEFAULT_SPILL_MAX_BYTES, MAX_MB_ENV_VAR, SPILL_MAX_MB_ENV_VAR, DatasetStore, budget_from_env, content_digest
+from wind_temp_core.wind import log_law_factor
 
 # --- Streamlit App Configuration ---
 st.set_page_config(layout="wide")
 
+# --- Opt-in Diagnostics (WTV_DIAGNOSTICS=1 or ?diagnostics=1 in the URL) ---
+def start_diagnostics():
+    """Per-rerun instrumentation; a no-op object unless requested via the env var or query parameter."""
+    if not diagnostics_requested(os.environ, st.query_params): return RerunDiagnostics(enabled=False)
+    state = st.session_state.setdefault("_diagnostics_state", {'session': uuid.uuid4().hex[:12], 'reruns': 0}); state['reruns'] += 1
+    return RerunDiagnostics(session_id=state['session'], rerun=state['reruns'])
+
+diagnostics = start_diagnostics()
+density_threshold_default = density_threshold_from_env(os.environ) # WTV_DENSITY_THRESHOLD, validated and clamped to the input minimum
+
 # --- Custom CSS Injection REMOVED ---
 
 st.title("EPW Weather Data Visualization")
 st.write("Upload an EPW file to visualize Wind Speed vs. Dry Bulb Temperature.")
 
-# --- Helper Function for Color Conversion ---
-def hex_to_rgba(hex_color, alpha=0.2):
-    """Converts a hex color string to an RGBA string."""
-    try:
-        hex_color = hex_color.lstrip('#')
-        if len(hex_color) == 3: hex_color = "".join([c*2 for c in hex_color])
-        if len(hex_color) != 6: raise ValueError("Invalid hex color length")
-        rgb = tuple(int(hex_color[i:i+2], 16) for i in (0, 2, 4))
-        return f'rgba({rgb[0]}, {rgb[1]}, {rgb[2]}, {alpha})'
-    except Exception:
-        return f'rgba(0, 255, 0, {alpha})' # Fallback to default green
-
-# --- Function to load and cache EPW data ---
-@st.cache_data
-def load_epw_data(uploaded_file_content):
+# --- Shared Dataset Store (one per server process, sized via env vars) ---
+@st.cache_resource
+def get_dataset_store():
+    """Returns the process-wide dataset store. WTV_CACHE_MAX_MB bounds memory, WTV_CACHE_DIR enables .npz spill (bounded by WTV_CACHE_DIR_MAX_MB)."""
+    return DatasetStore(max_bytes=budget_from_env(os.environ, MAX_MB_ENV_VAR, DEFAULT_MAX_BYTES), spill_dir=os.environ.get("WTV_CACHE_DIR") or None,
+                        spill_max_bytes=budget_from_env(os.environ, SPILL_MAX_MB_ENV_VAR, DEFAULT_SPILL_MAX_BYTES))
+
+def get_upload_digest(uploaded_file):
+    """Hashes the upload once; later reruns of the same upload reuse the digest from session state."""
+    digests = st.session_state.setdefault("_upload_digests", {})
+    if uploaded_file.file_id not in digests: digests[uploaded_file.file_id] = content_digest(uploaded_file.getvalue())
+    return digests[uploaded_file.file_id]
+
+def forget_other_uploads(uploaded_files):
+    """Drops remembered digests of files no longer in the uploader."""
+    keep = {f.file_id for f in uploaded_files}
+    digests = st.session_state.setdefault("_upload_digests", {})
+    for file_id in [k for k in digests if k not in keep]: del digests[file_id]
+
+# --- Function to load EPW data (parsed once per distinct file across all sessions) ---
+def parse_epw_data(uploaded_file_content):
     """Reads EPW data from uploaded file content."""
     try:
-        temp_file_path = "temp_epw_file.epw"
-        with open(temp_file_path, "wb") as f: f.write(uploaded_file_content)
-        data, meta = read_epw(temp_file_path)
-        os.remove(temp_file_path)
-        required_columns = ['temp_air', 'wind_speed']
-        if not all(col in data.columns for col in required_columns):
-            missing = [col for col in required_columns if col not in data.columns]
-            st.error(f"EPW file is missing required columns: {missing}"); return None, None
-        data = data[required_columns].copy()
-        data['temp_air'] = pd.to_numeric(data['temp_air'], errors='coerce')
-        data['wind_speed'] = pd.to_numeric(data['wind_speed'], errors='coerce')
-        data.dropna(subset=['temp_air', 'wind_speed'], inplace=True)
-        return data, meta
+        return load_station(uploaded_file_content) # Parsed in memory into float32 arrays on a start + step time axis
     except Exception as e:
         st.error(f"Error reading or parsing EPW file: {e}")
-        if os.path.exists("temp_epw_file.epw"): os.remove("temp_epw_file.epw")
         return None, None
 
+def load_epw_data(uploaded_file):
+    """Returns (data, meta) for an upload from the shared store, parsing only on a miss."""
+    return get_dataset_store().get_or_load(get_upload_digest(uploaded_file), lambda: parse_epw_data(uploaded_file.getvalue()))
+
+def shared_stage(digest, name, build):
+    """Per-dataset structure built once for every session, kept (and budgeted) next to the dataset in the shared store."""
+    built = []
+    def timed_build():
+        built.append(True)
+        with diagnostics.stage(name): return build()
+    value = get_dataset_store().derived(digest, name, timed_build)
+    diagnostics.record_cache(name, not built)
+    return value
+
+def load_epw_datasets(uploaded_files, max_workers=8):
+    """Loads several uploads through the shared store, parsing misses concurrently; returns [(file, digest, data, meta, error)]."""
+    store = get_dataset_store()
+    digests = [get_upload_digest(f) for f in uploaded_files]
+    loaded = [store.get(digest) for digest in digests]
+    missing = [i for i, entry in enumerate(loaded) if entry is None]
+    errors = {}
+    def parse(i):
+        try: return load_station(uploaded_files[i].getvalue()), None
+        except Exception as e: return (None, None), str(e)
+    if missing:
+        with ThreadPoolExecutor(max_workers=min(max_workers, len(missing))) as pool:
+            for i, ((data, meta), error) in zip(missing, pool.map(parse, missing)):
+                if error is None: store.put(digests[i], data, meta)
+                loaded[i], errors[i] = (data, meta), error
+    return [(f, digests[i], loaded[i][0], loaded[i][1], errors.get(i)) for i, f in enumerate(uploaded_files)]
+
+def finish_diagnostics():
+    """Emits the rerun as one JSON log line and shows the same numbers in a sidebar expander."""
+    if not diagnostics.enabled: return
+    store_stats = get_dataset_store().stats()
+    diagnostics.record(dataset_store={key: store_stats[key] for key in ('entries', 'bytes', 'hits', 'disk_hits', 'misses', 'evictions')})
+    record = diagnostics.emit()
+    with st.sidebar.expander("Diagnostics", expanded=True):
+        st.caption(f"Session {record['session']} · rerun {record['rerun']} · {record['total_ms']:.0f} ms ({record['untracked_ms']:.0f} ms in widgets / untimed code)")
+        stage_names = list(dict.fromkeys(list(record['stages_ms']) + list(record['cache_hits']) + list(record['cache_misses'])))
+        st.dataframe(pd.DataFrame({'Stage': stage_names, 'ms': [record['stages_ms'].get(name, 0.0) for name in stage_names],
+                                   'Cache': [f"{record['cache_hits'].get(name, 0)} hit / {record['cache_misses'].get(name, 0)} miss" if name in record['cache_hits'] or name in record['cache_misses'] else "" for name in stage_names]}),
+                     hide_index=True, use_container_width=True)
+        for name, size in record['figure_bytes'].items(): st.caption(f"Figure '{name}': {size / 1e6:.2f} MB serialized")
+        st.caption(f"Dataset store: {store_stats['entries']} entries, {store_stats['hits']} hits / {store_stats['misses']} misses")
+
+# --- Mode Selection ---
+app_mode = st.radio("Mode:", ["Single Station", "Compare Stations"], horizontal=True, key="app_mode_radio")
+
+# --- Multi-Station Comparison ---
+if app_mode == "Compare Stations":
+    uploaded_files = st.file_uploader("Choose EPW files", type="epw", accept_multiple_files=True, key="compare_uploader")
+    if not uploaded_files: st.info("Awaiting EPW file uploads..."); st.stop()
+    forget_other_uploads(uploaded_files)
+    with diagnostics.stage('load'): loaded_stations = load_epw_datasets(uploaded_files)
+    stations = []
+    for station_file, digest, data, meta, error in loaded_stations:
+        if error: st.error(f"Error reading or parsing {station_file.name}: {error}")
+        elif data is None or data.empty: st.warning(f"{station_file.name} contains no valid data rows after processing.")
+        else: stations.append((station_file.name, digest, data, meta))
+    if not stations: st.stop()
+    st.success(f"Loaded {len(stations)} station(s): " + ", ".join(meta.get('city', name) for name, _, _, meta in stations))
+
+    # --- Comparison Sidebar ---
+    st.sidebar.header("Comparison Settings")
+    with st.sidebar.expander("Layout", expanded=True):
+        compare_layout = st.radio("Layout:", ["Overlay", "Small Multiples"], key="compare_layout_radio", help="Overlay draws every station in one chart. Small Multiples gives each station its own panel, with the same axes on every panel.")
+        compare_cols = st.slider("Panels per Row:", min_value=1, max_value=6, value=4, step=1, key="compare_cols_slider", disabled=compare_layout != "Small Multiples")
+        compare_marker_size = st.slider("Marker Size:", min_value=1, max_value=20, value=3, step=1, key="compare_marker_size_slider")
+        compare_color_scale = st.selectbox("Marker Color Scale (Small Multiples):", options=['RdYlBu_r', 'Spectral_r'] + px.colors.named_colorscales(), index=0, key="compare_color_scale_select")
+        compare_panel_height = st.number_input("Panel Height (pixels):", min_value=150, max_value=1000, value=300, step=50, key="compare_panel_h_input")
+    with st.sidebar.expander("Comfort Band & Wind Adjustment", expanded=False):
+        compare_show_comfort = st.toggle("Show Comfort Band", value=True, key="compare_comfort_toggle")
+        compare_comfort_min = st.number_input("Comfort Min Temp (°C)", value=18.0, step=0.5, key="compare_comfort_min")
+        compare_comfort_max = st.number_input("Comfort Max Temp (°C)", value=32.0, step=0.5, key="compare_comfort_max")
+        compare_adjust = st.toggle("Enable Wind Adjustment", value=False, key="compare_adjust_toggle", help="Applies the same height/roughness adjustment to every station.")
+        compare_ref_h = st.number_input("Weather Station Ref. Height (m)", min_value=0.1, value=10.0, step=0.1, key="compare_ref_h", disabled=not compare_adjust)
+        compare_des_h = st.number_input("Desired Site Height (m)", min_value=0.1, value=10.0, step=0.1, key="compare_des_h", disabled=not compare_adjust)
+        compare_gr_stat = st.number_input("Ground Roughness (Station)", min_value=0.001, value=0.03, step=0.001, format="%.3f", key="compare_gr_stat", disabled=not compare_adjust)
+        compare_gr_site = st.number_input("Ground Roughness (Site)", min_value=0.001, value=0.03, step=0.001, format="%.3f", key="compare_gr_site", disabled=not compare_adjust)
+    compare_factor = 1.0
+    if compare_adjust:
+        compare_factor, compare_warning = log_law_factor(compare_ref_h, compare_des_h, compare_gr_stat, compare_gr_site)
+        if compare_warning: st.sidebar.warning(compare_warning)
+
+    # --- Per-Station Cached Arrays and Extents; Statistics Index shared by every session (built once per dataset) ---
+    stages = st.session_state.setdefault("_stage_cache", StageCache()); stages.diagnostics = diagnostics if diagnostics.enabled else None
+    station_arrays = []
+    for name, digest, data, meta in stations:
+        temp_values, wind_values = stages.get(f"station_arrays:{digest}", digest, lambda: (data.temp_air, data.wind_speed))
+        extent = stages.get(f"station_extent:{digest}", digest, lambda: (temp_values.min(), temp_values.max(), wind_values.min(), wind_values.max()))
+        index = shared_stage(digest, 'stats_index', lambda: StatisticsIndex(temp_values, wind_values))
+        station_arrays.append((meta.get('city', name), digest, data, temp_values, wind_values, extent, index))
+    current_slots = {digest for _, digest, _, _ in stations} | {str(position) for position in range(len(stations))} # Per-dataset stages and per-position trace slots
+    stages.prune(lambda stage: not stage.startswith("station_") or stage.split(":", 1)[1] in current_slots)
+
+    # --- Shared Axis Limits (one pass over the cached per-station extents) ---
+    extents = np.array([extent for *_, extent, _ in station_arrays])
+    (x_lo, x_hi), (y_lo, y_hi) = default_axis_limits(extents[:, :2], extents[:, 2:] * compare_factor)
+    x_min_data, x_max_data = float(extents[:, 0].min()), float(extents[:, 1].max())
+
+    # --- Side-by-Side Statistics Table ---
+    stats_rows = []
+    for city, digest, data, temp_values, wind_values, extent, index in station_arrays:
+        with diagnostics.stage('stats'): summary = index.summary(compare_factor, compare_comfort_min, compare_comfort_max)
+        stats_rows.append({'Station': city, 'Records': index.size, 'Average Wind (m/s)': round(summary['avg'], 2), 'P95 Wind (m/s)': round(summary['p95'], 2), 'Comfort %': round(summary['comfort_pct'], 1)})
+    stats_table = pd.DataFrame(stats_rows)
+
+    # --- Overlay Payload Guard (Overlay sends every record; stations above the density threshold need binned panels) ---
+    overlay_records = sum(temp_values.size for _, _, _, temp_values, *_ in station_arrays)
+    if compare_layout == "Overlay":
+        dense_stations = [city for city, _, _, temp_values, *_ in station_arrays if use_density_mode('Auto', temp_values.size, density_threshold_default)]
+        if dense_stations:
+            st.info(f"Showing Small Multiples instead of Overlay: station(s) above the density threshold of {density_threshold_default:,} records ({', '.join(dense_stations)}) are binned into heatmap panels. Overlay would send all {overlay_records:,} records to the browser.")
+            compare_layout = "Small Multiples"
+        elif overlay_records > density_threshold_default:
+            st.warning(f"Overlay sends all {overlay_records:,} records to the browser, which may be slow. Small Multiples bins any station above {density_threshold_default:,} records.")
+
+    # --- Traces from cached arrays (hover time parts shared per dataset; one trace slot per station position, so the same file uploaded twice keeps two) ---
+    colors = station_colors(len(station_arrays)); traces = []
+    for position, ((city, digest, data, temp_values, wind_values, extent, index), color) in enumerate(zip(station_arrays, colors)):
+        hover_times = shared_stage(digest, 'hover_times', lambda: hover_time_parts(data.index()))
+        if compare_layout == "Overlay":
+            traces.append(stages.get(f"station_trace:{position}", (digest, compare_factor, 'overlay', color, compare_marker_size), lambda: station_trace(temp_values, wind_values * compare_factor, hover_times, city, color, compare_marker_size)))
+        elif use_density_mode('Auto', len(temp_values), density_threshold_default):
+            traces.append(stages.get(f"station_trace:{position}", (digest, compare_factor, 'density'), lambda: density_heatmap_trace(bin_density(temp_values, wind_values * compare_factor), coloraxis=DENSITY_COLORAXIS)))
+        else:
+            traces.append(stages.get(f"station_trace:{position}", (digest, compare_factor, 'panel', compare_marker_size), lambda: scatter_trace(temp_values, wind_values * compare_factor, hover_times, compare_marker_size)))
+
+    chart_options = dict(x_range=(x_lo, x_hi), y_range=(y_lo, y_hi), font_size=12, show_comfort_band=compare_show_comfort, comfort_min=compare_comfort_min, comfort_max=compare_comfort_max,
+                         colorscale=compare_color_scale, cmin=x_min_data, cmax=x_max_data, colorbar_length=0.6)
+    st.subheader("Wind Speed vs. Dry Bulb Temperature - Station Comparison")
+    with diagnostics.stage('layout'):
+        if compare_layout == "Overlay":
+            fig = build_figure(traces, None, dict(chart_options, height=max(600, compare_panel_height * 2), width=None))
+            fig.update_layout(legend=dict(itemsizing='constant'), coloraxis_showscale=False)
+        else:
+            titles = [f"{row['Station']}<br><sup>avg {row['Average Wind (m/s)']:.1f} · P95 {row['P95 Wind (m/s)']:.1f} m/s</sup>" for row in stats_rows]
+            panel_cols = min(compare_cols, len(traces)) # No empty panels when fewer stations than columns
+            fig = build_small_multiples(traces, titles, dict(chart_options, height=compare_panel_height * max(1, -(-len(traces) // panel_cols)), width=None), cols=panel_cols)
+    diagnostics.record_figure('comparison', fig)
+    with diagnostics.stage('plotly_chart'): st.plotly_chart(fig, use_container_width=True, config={'displaylogo': False})
+
+    st.subheader("Station Statistics")
+    st.dataframe(stats_table, hide_index=True, use_container_width=True)
+    st.download_button("Download Statistics (CSV)", data=stats_table.to_csv(index=False).encode('utf-8'), file_name="station_comparison.csv", mime="text/csv", key="compare_stats_download")
+    diagnostics.record(mode='compare', layout=compare_layout, stations=len(station_arrays), records=int(sum(index.size for *_, index in station_arrays)))
+    finish_diagnostics()
+    st.stop()
+
 # --- File Uploader ---
 uploaded_file = st.file_uploader("Choose an EPW file", type="epw")
 
 if uploaded_file is not None:
-    epw_content = uploaded_file.getvalue()
-    df_weather, metadata = load_epw_data(epw_content)
+    forget_other_uploads([uploaded_file])
+    with diagnostics.stage('load'): weather_data, metadata = load_epw_data(uploaded_file)
 
-    if df_weather is not None and not df_weather.empty:
+    if weather_data is not None and not weather_data.empty:
         st.success(f"Successfully loaded EPW data for: {metadata.get('city', 'Unknown Location')}")
 
+        # --- Memoized Pipeline Stages (each recomputed only when its own inputs change) ---
+        stages = st.session_state.setdefault("_stage_cache", StageCache()); stages.diagnostics = diagnostics if diagnostics.enabled else None
+        dataset_key = get_upload_digest(uploaded_file)
+        temp_values, wind_values = stages.get('arrays', dataset_key, lambda: (weather_data.temp_air, weather_data.wind_speed))
+        x_min_data, x_max_data, y_min_data_orig, y_max_data_orig = stages.get('data_extent', dataset_key, lambda: (float(temp_values.min()), float(temp_values.max()), float(wind_values.min()), float(wind_values.max())))
+        calendar_index = shared_stage(dataset_key, 'calendar', lambda: CalendarIndex(weather_data.index())) # Shared by every session, like the statistics index
+
         # --- Initialize Session State for Axis Limits (if not already done) ---
         if 'x_min_limit' not in st.session_state:
-            x_min_data, x_max_data = float(df_weather['temp_air'].min()), float(df_weather['temp_air'].max())
-            y_min_data_orig, y_max_data_orig = float(df_weather['wind_speed'].min()), float(df_weather['wind_speed'].max())
-            x_buffer = max((x_max_data - x_min_data) * 0.05, 1.0)
-            y_buffer_orig = max((y_max_data_orig - y_min_data_orig) * 0.05, 0.5)
-            st.session_state.x_min_limit = float(round(x_min_data - x_buffer))
-            st.session_state.x_max_limit = float(round(x_max_data + x_buffer))
-            st.session_state.y_min_limit = max(0.0, round(y_min_data_orig - y_buffer_orig, 1))
-            st.session_state.y_max_limit = round(y_max_data_orig + y_buffer_orig, 1)
+            (st.session_state.x_min_limit, st.session_state.x_max_limit), (st.session_state.y_min_limit, st.session_state.y_max_limit) = default_axis_limits(temp_values, wind_values)
             st.session_state.x_slider_range = (st.session_state.x_min_limit, st.session_state.x_max_limit)
             st.session_state.y_slider_range = (st.session_state.y_min_limit, st.session_state.y_max_limit)
 
@@ -89,8 +249,6 @@ if uploaded_file is not None:
 
         # --- Expander for Axis Limits --- (Default Closed)
         with st.sidebar.expander("Axis Limits", expanded=False):
-            x_min_data, x_max_data = float(df_weather['temp_air'].min()), float(df_weather['temp_air'].max())
-            y_min_data_orig, y_max_data_orig = float(df_weather['wind_speed'].min()), float(df_weather['wind_speed'].max())
             x_buffer_large = max((x_max_data - x_min_data) * 0.1, 5.0); y_buffer_large = max((y_max_data_orig - y_min_data_orig) * 0.1, 2.0)
             slider_x_min = float(round(x_min_data - x_buffer_large)); slider_x_max = float(round(x_max_data + x_buffer_large))
             slider_y_min = 0.0; slider_y_max = float(round(y_max_data_orig + y_buffer_large + 20))
@@ -112,6 +270,15 @@ if uploaded_file is not None:
             groundRoughnessStation = st.number_input("Ground Roughness (Station)", min_value=0.001, value=0.03, step=0.001, format="%.3f", key="gr_stat", help="Typical values: Open sea=0.0002, Open terrain=0.03, Suburbs=0.5, City center=1.0+", disabled=not enable_wind_adjustment)
             groundRoughnessSite = st.number_input("Ground Roughness (Site)", min_value=0.001, value=0.03, step=0.001, format="%.3f", key="gr_site", help="Typical values: Open sea=0.0002, Open terrain=0.03, Suburbs=0.5, City center=1.0+", disabled=not enable_wind_adjustment)
 
+        # --- Expander for Seasonal / Diurnal Time Filter ---
+        with st.sidebar.expander("Time Filter", expanded=False):
+            filter_season = st.selectbox("Months:", options=list(SEASONS) + ['Custom'], index=0, key="season_select", help="Restrict the chart and statistics to a season, or pick months under Custom.")
+            filter_months = st.multiselect("Custom Months:", options=list(range(1, 13)), default=list(range(1, 13)), format_func=lambda m: MONTH_NAMES[m - 1], key="custom_months_select", disabled=filter_season != 'Custom')
+            filter_hours = st.slider("Hours of Day (from, to):", min_value=0, max_value=24, value=(0, 24), step=1, key="hour_range_slider", help="Keeps records whose hour starts in [from, to), e.g. 8-18 for occupied hours.")
+            filter_weekdays = st.multiselect("Days of Week:", options=list(range(7)), default=list(range(7)), format_func=lambda d: WEEKDAY_NAMES[d], key="weekday_select")
+            time_filter = (month_bits(filter_months if filter_season == 'Custom' else SEASONS[filter_season]), hour_bits(*filter_hours), weekday_bits(filter_weekdays))
+            st.caption(f"{calendar_index.count(*time_filter):,} of {calendar_index.size:,} records selected")
+
         # --- Expander for Comfort Band Settings ---
         with st.sidebar.expander("Comfort Band Settings", expanded=False):
             show_comfort_band = st.toggle("Show Comfort Band", value=True, key="show_comfort_toggle", help="Enable or disable the display of the comfort band and its annotation.")
@@ -135,6 +302,7 @@ if uploaded_file is not None:
         with st.sidebar.expander("Statistics Annotations", expanded=False):
             annotation_align = st.selectbox("Text Alignment:", options=['Center', 'Left', 'Right'], index=1, key="annot_align_select", help="Set the horizontal position of the Average/Percentile text labels.") # Default Left
             annotation_yshift = st.slider("Text Vertical Shift (pixels):", min_value=-30, max_value=50, value=15, step=1, key="annot_yshift_slider", help="Adjust the vertical distance of the stats text from its line (+ve is above, -ve is below).") # Default 15
+            extra_percentiles = st.multiselect("Extra Percentile Lines:", options=[50, 75, 90, 99], default=[], key="extra_percentiles_select", help="Add further wind speed percentile lines to the chart (in addition to the 95th).")
 
         # --- Expander for Marker & Scale ---
         with st.sidebar.expander("Marker & Color Scale", expanded=False):
@@ -149,95 +317,109 @@ if uploaded_file is not None:
             selected_color_scale = st.selectbox("Select Marker Color Scale:", options=ordered_scales, index=default_color_index, key="color_scale_select", help="Controls the color gradient applied to the data points based on temperature.")
             marker_size = st.slider("Marker Size:", min_value=1, max_value=20, value=4, step=1, key="marker_size_slider", help="Adjust the size of the data points (dots).") # Default 4
             use_outline = st.toggle("Outline Markers Only", value=False, key="marker_outline_toggle", help="If activated, only the border of the markers will be colored, the inside will be transparent.")
-            outline_width = 1.5 if use_outline else 0.5; filled_marker_line_color = 'rgba(0,0,0,0.4)'
             colorbar_length = st.slider("Color Bar Length (Fraction of Plot Height):", min_value=0.1, max_value=1.0, value=0.8, step=0.05, key="cbar_len_slider", help="Adjust the vertical length of the color bar legend relative to the plot height.") # Default 0.8
 
+        # --- Expander for Rendering Mode ---
+        with st.sidebar.expander("Rendering", expanded=False):
+            render_mode = st.selectbox("Render Mode:", options=['Auto', 'Scatter', 'Density'], index=0, key="render_mode_select", help="Scatter draws every record. Density bins records on the server into a heatmap, so chart size no longer grows with the number of records. Auto switches to Density above the threshold.")
+            density_threshold = st.number_input("Auto Density Threshold (points):", min_value=MIN_DENSITY_THRESHOLD, value=density_threshold_default, step=1000, key="density_threshold_input", disabled=render_mode != 'Auto')
+            density_x_bins = st.slider("Density Bins (Temperature):", min_value=20, max_value=300, value=120, step=10, key="density_x_bins_slider")
+            density_y_bins = st.slider("Density Bins (Wind Speed):", min_value=20, max_value=200, value=80, step=10, key="density_y_bins_slider")
+
         # --- Expander for Plot Dimensions & Export ---
         with st.sidebar.expander("Plot Dimensions & Export", expanded=False):
             plot_width = st.number_input("Plot Width (pixels):", min_value=300, max_value=2000, value=1200, step=50, key="plot_w_input", help="Set the width of the chart on screen in pixels.") # Default 1200
             plot_height = st.number_input("Plot Height (pixels):", min_value=200, max_value=1500, value=900, step=50, key="plot_h_input", help="Set the height of the chart on screen in pixels.") # Default 900
             download_scale = st.slider("Download Image Scale Factor:", min_value=1.0, max_value=10.0, value=4.0, step=0.5, key="dl_scale_slider", help="Increase resolution of downloaded PNG image. Scale=1 is screen resolution. Higher values = larger image file size.") # Default 4.0
 
-        # --- Perform Wind Speed Adjustment ---
-        df_plot_data = df_weather.copy(); adjustment_factor = 1.0
+        # --- Perform Wind Speed Adjustment (scalar factor; arrays rescaled only when it changes) ---
+        adjustment_factor = 1.0
         if enable_wind_adjustment:
-            valid_inputs = (desiredHeight > 0 and groundRoughnessSite > 0 and referenceHeight > 0 and groundRoughnessStation > 0 and desiredHeight / groundRoughnessSite > 0 and referenceHeight / groundRoughnessStation > 0)
-            if valid_inputs:
-                 log_arg_num = desiredHeight / groundRoughnessSite; log_arg_den = referenceHeight / groundRoughnessStation
-                 if abs(log_arg_den - 1.0) < 1e-9 or abs(math.log(log_arg_den)) < 1e-9 : st.sidebar.warning("Wind adj. failed: Log ratio denominator near zero."); adjustment_factor = 1.0
-                 else:
-                      log_num = math.log(log_arg_num) if abs(log_arg_num - 1.0) > 1e-9 else 0.0; log_den = math.log(log_arg_den)
-                      adjustment_factor = log_num / log_den
-                      df_plot_data['wind_speed'] = df_plot_data['wind_speed'] * adjustment_factor; st.sidebar.info(f"Applied wind adj. factor: {adjustment_factor:.3f}")
-            else: st.sidebar.warning("Invalid height/roughness values for wind adjustment."); adjustment_factor = 1.0
-
-        # --- Calculate Statistics ---
-        comfort_percentage = 0.0
-        if not df_plot_data.empty:
-            avg_wsp = df_plot_data['wind_speed'].mean(); p95_wsp = df_plot_data['wind_speed'].quantile(0.95)
-            comfort_mask = (df_plot_data['temp_air'] >= comfort_band_min_temp) & (df_plot_data['temp_air'] <= comfort_band_max_temp)
-            if len(df_plot_data) > 0: comfort_percentage = (comfort_mask.sum() / len(df_plot_data)) * 100
-        else: avg_wsp = 0; p95_wsp = 0
+            adjustment_factor, adjustment_warning = log_law_factor(referenceHeight, desiredHeight, groundRoughnessStation, groundRoughnessSite)
+            if adjustment_warning: st.sidebar.warning(adjustment_warning)
+            else: st.sidebar.info(f"Applied wind adj. factor: {adjustment_factor:.3f}")
+
+        # --- Time Filter Subset (the row mask is one lookup-table gather over the cached calendar codes) ---
+        subset_key = (dataset_key, time_filter)
+        row_mask = stages.get('subset_mask', subset_key, lambda: calendar_index.mask(*time_filter))
+        subset_temp, subset_wind = stages.get('subset_arrays', subset_key, lambda: (temp_values, wind_values) if row_mask is None else (temp_values[row_mask], wind_values[row_mask]))
+        if subset_temp.size == 0: st.warning("No records match the time filter.")
+
+        wind_key = (subset_key, adjustment_factor)
+        adjusted_wind = stages.get('adjusted_wind', wind_key, lambda: subset_wind * adjustment_factor if adjustment_factor != 1.0 else subset_wind)
+
+        # --- Calculate Statistics (sorted index built once per dataset and shared across sessions; each query is O(1) or O(log n)) ---
+        stats_index = shared_stage(dataset_key, 'stats_index', lambda: StatisticsIndex(temp_values, wind_values))
+        sort_orders = None if row_mask is None else shared_stage(dataset_key, 'sort_orders', stats_index.sort_orders) # Built on the first filtered view of the dataset
+        subset_index = stages.get('subset_index', subset_key, lambda: stats_index if row_mask is None else stats_index.subset(row_mask, sort_orders)) # Only this session's current filter
+        with diagnostics.stage('stats'): stats = subset_index.summary(adjustment_factor, comfort_band_min_temp, comfort_band_max_temp, sorted(extra_percentiles))
 
         # --- Create Plot ---
         st.subheader("Wind Speed vs. Dry Bulb Temperature")
-        fig = go.Figure(data=go.Scattergl(x=df_plot_data['temp_air'], y=df_plot_data['wind_speed'], mode='markers', marker=dict(size=marker_size, line=dict(width=outline_width, color=filled_marker_line_color)), hovertemplate="<b>Time:</b> %{customdata}<br><b>Temp:</b> %{x:.1f} °C<br><b>Wind Speed:</b> %{y:.1f} m/s<extra></extra>", customdata=df_plot_data.index.strftime('%Y-%m-%d %H:%M')))
-
-        # --- Apply Color Styling Conditionally ---
-        colorbar_config = dict(title="Temp (°C)", len=colorbar_length, title_font=dict(size=selected_font_size, color=selected_font_color), tickfont=dict(size=selected_font_size, color=selected_font_color))
-        if use_outline: fig.update_traces(marker=dict(color='rgba(0,0,0,0)', line=dict(color=df_plot_data['temp_air'], colorscale=selected_color_scale, width=outline_width, cmin=df_plot_data['temp_air'].min(), cmax=df_plot_data['temp_air'].max()), colorscale=selected_color_scale, cmin=df_plot_data['temp_air'].min(), cmax=df_plot_data['temp_air'].max(), showscale=True, colorbar=colorbar_config), selector=dict(mode='markers'))
-        else: fig.update_traces(marker=dict(color=df_plot_data['temp_air'], colorscale=selected_color_scale, line=dict(width=outline_width, color=filled_marker_line_color), cmin=df_plot_data['temp_air'].min(), cmax=df_plot_data['temp_air'].max(), showscale=True, colorbar=colorbar_config), selector=dict(mode='markers'))
-
-        # --- Determine Background Colors ---
-        if transparent_bg: plot_bg_to_use, paper_bg_to_use = ('rgba(0,0,0,0)', 'rgba(0,0,0,0)')
-        else: plot_bg_to_use = selected_chart_bg_color; paper_bg_to_use = selected_chart_bg_color
-
-        # --- Apply Layout Options ---
-        fig.update_layout(
-            width=plot_width, height=plot_height, xaxis_title='Dry Bulb Temperature (°C)', yaxis_title='Wind Speed (m/s)',
-            xaxis_range=[st.session_state.x_min_limit, st.session_state.x_max_limit], yaxis_range=[st.session_state.y_min_limit, st.session_state.y_max_limit],
-            font=dict(size=selected_font_size, color=selected_font_color), # Global Default
-            xaxis_title_font=dict(size=selected_font_size, color=selected_font_color), yaxis_title_font=dict(size=selected_font_size, color=selected_font_color),
-            xaxis_tickfont=dict(size=selected_font_size, color=selected_font_color), yaxis_tickfont=dict(size=selected_font_size, color=selected_font_color),
-            plot_bgcolor=plot_bg_to_use, paper_bgcolor=paper_bg_to_use,
-            margin=dict(l=50, r=50, t=50, b=50)
-        )
-
-        # --- Add Comfort Band Shape (Conditional)---
-        actual_comfort_min = min(comfort_band_min_temp, comfort_band_max_temp)
-        actual_comfort_max = max(comfort_band_min_temp, comfort_band_max_temp)
-        if show_comfort_band:
-            fig.add_shape(type="rect", xref="x", yref="paper", x0=actual_comfort_min, y0=0, x1=actual_comfort_max, y1=1, fillcolor=comfort_band_rgba, line_width=0, layer="below")
-
-        # --- Add Lines and Annotations for Stats ---
-        if not df_plot_data.empty:
-             # Stats Annotations (Average / Percentile)
-             x_range_width = st.session_state.x_max_limit - st.session_state.x_min_limit
-             annotation_x_stat = st.session_state.x_min_limit; x_anchor_stat = 'left'; x_shift_stat = 10
-             if annotation_align == 'Center': annotation_x_stat = st.session_state.x_min_limit + x_range_width * 0.5; x_anchor_stat = 'center'; x_shift_stat = 0
-             elif annotation_align == 'Right': annotation_x_stat = st.session_state.x_max_limit; x_anchor_stat = 'right'; x_shift_stat = -10
-             annotation_font = dict(size=selected_font_size, color=selected_font_color); annotation_bgcolor = 'rgba(255,255,255,0.6)'
-             fig.add_hline(y=avg_wsp, line_dash="dash", line_color=selected_font_color, opacity=0.7)
-             fig.add_annotation(x=annotation_x_stat, y=avg_wsp, text=f"Average Wind Speed [{avg_wsp:.1f}] m/s", showarrow=False, yshift=annotation_yshift, font=annotation_font, bgcolor=annotation_bgcolor, xanchor=x_anchor_stat, xshift=x_shift_stat)
-             fig.add_hline(y=p95_wsp, line_dash="dot", line_color=selected_font_color, opacity=0.7)
-             fig.add_annotation(x=annotation_x_stat, y=p95_wsp, text=f"95th Percentile [{p95_wsp:.1f}] m/s", showarrow=False, yshift=annotation_yshift, font=annotation_font, bgcolor=annotation_bgcolor, xanchor=x_anchor_stat, xshift=x_shift_stat)
-
-             # Comfort Band Annotation (Conditional)
-             if show_comfort_band and actual_comfort_max > actual_comfort_min:
-                 comfort_annotation_x = actual_comfort_min; comfort_x_anchor = 'left'; comfort_x_shift = 5
-                 if comfort_annot_align == 'Center': comfort_annotation_x = actual_comfort_min + (actual_comfort_max - actual_comfort_min) * 0.5; comfort_x_anchor = 'center'; comfort_x_shift = 0
-                 elif comfort_annot_align == 'Right': comfort_annotation_x = actual_comfort_max; comfort_x_anchor = 'right'; comfort_x_shift = -5
-                 comfort_text = f"Comfort Band<br>{comfort_percentage:.1f}% of the year"
-                 fig.add_annotation(x=comfort_annotation_x, yref="paper", y=comfort_annot_ypos, text=comfort_text, showarrow=False, font=annotation_font, bgcolor=annotation_bgcolor, align="center", xanchor=comfort_x_anchor, xshift=comfort_x_shift, yanchor="middle")
+        if row_mask is not None: st.caption(f"Time filter: {subset_temp.size:,} of {temp_values.size:,} records (statistics and comfort % follow the filter).")
+        density_mode = use_density_mode(render_mode, len(subset_temp), density_threshold)
+        if density_mode:
+            # --- Density Mode: bin on the server, send a fixed-size grid ---
+            st.caption(f"Density mode: {len(subset_temp):,} records binned into a {density_x_bins}×{density_y_bins} grid.")
+            trace = stages.get('trace', (wind_key, 'density', density_x_bins, density_y_bins), lambda: density_heatmap_trace(bin_density(subset_temp, adjusted_wind, density_x_bins, density_y_bins)))
+            colorbar_title, color_min, color_max = "Records", None, None
+        else:
+            hover_times = shared_stage(dataset_key, 'hover_times', lambda: hover_time_parts(weather_data.index()))
+            subset_hover_times = stages.get('subset_hover_times', subset_key, lambda: hover_times if row_mask is None else hover_times[row_mask])
+            trace = stages.get('trace', (wind_key, 'scatter', marker_size, use_outline), lambda: scatter_trace(subset_temp, adjusted_wind, subset_hover_times, marker_size, use_outline))
+            colorbar_title, color_min, color_max = "Temp (°C)", x_min_data, x_max_data
+
+        # --- Layout Stage (the only work a purely cosmetic change triggers) ---
+        with diagnostics.stage('layout'): fig = build_figure([trace], stats, dict(
+            width=plot_width, height=plot_height,
+            x_range=(st.session_state.x_min_limit, st.session_state.x_max_limit), y_range=(st.session_state.y_min_limit, st.session_state.y_max_limit),
+            font_size=selected_font_size, font_color=selected_font_color, bg_color=selected_chart_bg_color, transparent_bg=transparent_bg,
+            colorscale=selected_color_scale, colorbar_length=colorbar_length, colorbar_title=colorbar_title, cmin=color_min, cmax=color_max,
+            show_comfort_band=show_comfort_band, comfort_min=comfort_band_min_temp, comfort_max=comfort_band_max_temp, comfort_rgba=comfort_band_rgba,
+            comfort_align=comfort_annot_align, comfort_ypos=comfort_annot_ypos, comfort_scope='the year' if row_mask is None else 'the selected period', annotation_align=annotation_align, annotation_yshift=annotation_yshift,
+        ))
 
         # --- Configure Download Options ---
-        config = {'toImageButtonOptions': {'format': 'png', 'filename': f"epw_plot_{metadata.get('city', 'location').replace(' ','_')}", 'height': plot_height, 'width': plot_width, 'scale': download_scale}, 'displaylogo': False}
+        config = download_config(metadata.get('city', 'location'), plot_width, plot_height, download_scale)
 
         # Display plot in Streamlit, passing the config
-        st.plotly_chart(fig, use_container_width=False, config=config)
+        diagnostics.record_figure('main', fig)
+        diagnostics.record(mode='single', records=len(subset_temp), render_mode='density' if density_mode else 'scatter')
+        with diagnostics.stage('plotly_chart'): st.plotly_chart(fig, use_container_width=False, config=config)
+
+        # --- Wind Adjustment Sensitivity Sweep (all combinations in one vectorized pass) ---
+        with st.expander("Height / Roughness Sensitivity Sweep", expanded=False):
+            st.caption(f"Station side uses the sidebar values: reference height {referenceHeight:g} m, station roughness {groundRoughnessStation:g}.")
+            sweep_col1, sweep_col2 = st.columns(2)
+            with sweep_col1:
+                sweep_heights = st.slider("Site Height Range (m):", min_value=0.5, max_value=200.0, value=(2.0, 100.0), step=0.5, key="sweep_height_range")
+                sweep_height_steps = st.number_input("Height Steps:", min_value=2, max_value=200, value=40, step=1, key="sweep_height_steps")
+                sweep_thresholds_text = st.text_input("Exceedance Thresholds (m/s, comma-separated):", value="5, 10", key="sweep_thresholds")
+            with sweep_col2:
+                sweep_roughness = st.slider("Site Roughness Range (m):", min_value=0.0002, max_value=3.0, value=(0.001, 2.0), step=0.0001, format="%.4f", key="sweep_roughness_range")
+                sweep_roughness_steps = st.number_input("Roughness Steps (log-spaced):", min_value=2, max_value=200, value=30, step=1, key="sweep_roughness_steps")
+            try: sweep_thresholds = [float(v) for v in sweep_thresholds_text.split(',') if v.strip()]
+            except ValueError: st.warning("Exceedance thresholds must be numbers separated by commas."); sweep_thresholds = []
+            sweep_result = stages.get('sweep', (subset_key, referenceHeight, groundRoughnessStation, sweep_heights, sweep_height_steps, sweep_roughness, sweep_roughness_steps, tuple(sweep_thresholds)), lambda: sensitivity_sweep(
+                subset_index, referenceHeight, np.linspace(sweep_heights[0], sweep_heights[1], int(sweep_height_steps)), groundRoughnessStation,
+                np.geomspace(sweep_roughness[0], sweep_roughness[1], int(sweep_roughness_steps)), sweep_thresholds))
+            metric_options = list(SWEEP_METRICS) + [col for col in sweep_result.columns if col.startswith('exceed_')]
+            sweep_metric = st.selectbox("Heatmap Metric:", options=metric_options, format_func=lambda m: SWEEP_METRICS.get(m, m.replace('exceed_', '% of records above ').replace('_pct', ' m/s')), key="sweep_metric_select")
+            with diagnostics.stage('sweep_chart'): sweep_fig = sweep_heatmap(sweep_result, sweep_metric, colorscale=selected_color_scale)
+            diagnostics.record_figure('sweep', sweep_fig)
+            st.plotly_chart(sweep_fig, use_container_width=True)
+            st.download_button("Download Sweep Table (CSV)", data=sweep_result.to_csv(index=False).encode('utf-8'), file_name=f"wind_sweep_{metadata.get('city', 'location').replace(' ','_')}.csv", mime="text/csv", key="sweep_download")
+
+        # --- Expander for Dataset Cache Metrics ---
+        with st.sidebar.expander("Dataset Cache", expanded=False):
+            cache_stats = get_dataset_store().stats()
+            st.caption(f"{cache_stats['entries']} dataset(s), {cache_stats['bytes'] / 1e6:.1f} / {cache_stats['max_bytes'] / 1e6:.0f} MB")
+            st.caption(f"Hits: {cache_stats['hits']} (disk: {cache_stats['disk_hits']}) | Misses: {cache_stats['misses']} | Evictions: {cache_stats['evictions']} | Hit rate: {cache_stats['hit_rate']:.0%}")
 
         # --- Optional: Display Data Table ---
-        if st.checkbox("Show Filtered Data Table"): st.subheader("Data Points in Plot"); st.dataframe(df_plot_data)
+        if st.checkbox("Show Filtered Data Table"): st.subheader("Data Points in Plot"); st.dataframe(pd.DataFrame({'temp_air': subset_temp, 'wind_speed': adjusted_wind}, index=weather_data.index() if row_mask is None else weather_data.index()[row_mask]))
+
+    elif weather_data is not None and weather_data.empty: st.warning("The loaded EPW file contains no valid data rows after processing.")
+else: st.info("Awaiting EPW file upload...")
 
-    elif df_weather is not None and df_weather.empty: st.warning("The loaded EPW file contains no valid data rows after processing.")
-else: st.info("Awaiting EPW file upload...")
\ No newline at end of file
+finish_diagnostics()
@@ -0,0 +1,29 @@
+"""Small EPW files built in memory for the tests (every column present, as in real files)."""
+
+import numpy as np
+
+DAYS_IN_MONTH = [31, 28, 31, 30, 31, 30, 31, 31, 30, 31, 30, 31]
+TMY_YEARS = [1999, 2005, 1992, 2011, 2003, 1998, 2007, 1995, 2014, 2001, 1996, 2009]  # One source year per month, like a TMY file
+
+
+def calendar_records(years=(1991,) * 12, records_per_hour=1, seed=0):
+    """(year, month, day, hour, minute, temp_air, wind_speed) rows for one 365-day year; `years` gives each month's year."""
+    rng = np.random.default_rng(seed)
+    step = 60 // records_per_hour
+    rows = [(year, month, day, hour, (i + 1) * step)
+            for month, (year, days) in enumerate(zip(years, DAYS_IN_MONTH), start=1)
+            for day in range(1, days + 1) for hour in range(1, 25) for i in range(records_per_hour)]
+    temp_air = np.round(rng.normal(12, 9, len(rows)), 1); wind_speed = np.round(rng.weibull(2.0, len(rows)) * 4.5, 1)
+    return [row + (t, w) for row, t, w in zip(rows, temp_air, wind_speed)]
+
+
+def epw_bytes(records, tz=-5.0, records_per_hour=1, newline='\n', city="Test City"):
+    """EPW file content for `records` (rows as returned by `calendar_records`)."""
+    header = [
+        f"LOCATION,{city},ST,XYZ,Test,999999,40.00,-75.00,{tz},100.0",
+        "DESIGN CONDITIONS,0", "TYPICAL/EXTREME PERIODS,0", "GROUND TEMPERATURES,0", "HOLIDAYS/DAYLIGHT SAVINGS,No,0,0,0",
+        "COMMENTS 1,Test data", "COMMENTS 2,", f"DATA PERIODS,1,{records_per_hour},Data,Sunday, 1/ 1,12/31",
+    ]
+    lines = [f"{y},{m},{d},{h},{mi},?9?9?9?9E0?9?9?9,{t:.1f},5.0,70,101325,9999,9999,0,0,0,0,0,0,0,0,180,{w:.1f},5,5,16.0,77777,9,999999999,10,0.1,0,88,0.2,0,1"
+             for y, m, d, h, mi, t, w in records]
+    return (newline.join(header + lines) + newline).encode('utf-8')
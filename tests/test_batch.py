@@ -0,0 +1,36 @@
+import csv
+
+import numpy as np
+import pytest
+
+from epw_samples import calendar_records, epw_bytes
+from wind_temp_core import load_station
+from wind_temp_core.batch import build_parser, main
+
+
+@pytest.mark.parametrize('workers', ['0', '-2', 'two'])
+def test_invalid_worker_count_exits_with_usage_error(workers, tmp_path, capsys):
+    with pytest.raises(SystemExit) as exit_info:
+        main([str(tmp_path), '--workers', workers])
+    assert exit_info.value.code == 2
+    assert '--workers' in capsys.readouterr().err
+
+
+def test_worker_count_is_parsed():
+    assert build_parser().parse_args(['in', '-j', '3']).workers == 3
+    assert build_parser().parse_args(['in']).workers is None
+
+
+def test_stats_csv_has_a_column_per_requested_percentile(tmp_path):
+    input_dir = tmp_path / 'in'; input_dir.mkdir()
+    (input_dir / 'station.epw').write_bytes(epw_bytes(calendar_records()))
+    (input_dir / 'broken.epw').write_bytes(b"not an epw file\n")
+    out = tmp_path / 'out'
+    assert main([str(input_dir), '-o', str(out), '--formats', 'html', '-j', '1', '--percentiles', '99', '50', '95']) == 1  # broken.epw fails
+    with open(out / 'stats.csv', newline='', encoding='utf-8') as f: rows = {row['file']: row for row in csv.DictReader(f)}
+    header = list(rows['station.epw'])
+    assert header[header.index('p95_wind') + 1:header.index('comfort_pct')] == ['p50_wind', 'p99_wind']
+    data, _ = load_station((input_dir / 'station.epw').read_bytes())
+    assert float(rows['station.epw']['p99_wind']) == pytest.approx(np.percentile(data.wind_speed.astype(np.float64), 99), abs=1e-3)
+    assert rows['broken.epw']['p99_wind'] == '' and rows['broken.epw']['error']
+    assert (out / 'station.html').exists()
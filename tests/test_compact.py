@@ -0,0 +1,76 @@
+import io
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from epw_samples import TMY_YEARS, calendar_records, epw_bytes
+from wind_temp_core import read_epw_bytes
+from wind_temp_core.compact import CompactDataset
+from wind_temp_core.store import DatasetStore
+
+
+def _frame(**kwargs):
+    data, _ = read_epw_bytes(epw_bytes(calendar_records(**kwargs), **{key: kwargs[key] for key in ('records_per_hour',) if key in kwargs}, tz=5.5))
+    return data
+
+
+def _npz_round_trip(dataset):
+    buffer = io.BytesIO(); np.savez(buffer, **dataset.to_arrays()); buffer.seek(0)
+    with np.load(buffer) as npz: return CompactDataset.from_arrays({key: npz[key] for key in npz.files})
+
+
+def _assert_same(dataset, frame):
+    pd.testing.assert_index_equal(dataset.index().as_unit('ns'), frame.index.as_unit('ns'), check_names=False)  # Resolution is not kept
+    np.testing.assert_array_equal(dataset.temp_air, frame['temp_air'].to_numpy(dtype=np.float32))
+    np.testing.assert_array_equal(dataset.wind_speed, frame['wind_speed'].to_numpy(dtype=np.float32))
+
+
+def test_regular_axis_keeps_no_offsets():
+    frame = _frame(records_per_hour=4)
+    dataset = CompactDataset.from_frame(frame)
+    assert dataset.offsets is None and dataset.step == pd.Timedelta(minutes=15)
+    assert dataset.nbytes == frame.shape[0] * 8
+    _assert_same(dataset, frame)
+
+
+def test_gaps_keep_step_counts():
+    frame = _frame().drop(index=_frame().index[[5, 6, 100]])
+    dataset = CompactDataset.from_frame(frame)
+    assert dataset.step == pd.Timedelta(hours=1) and dataset.offsets.dtype == np.int32
+    _assert_same(dataset, frame)
+
+
+def test_mixed_year_tmy_axis_round_trips():
+    frame = _frame(years=TMY_YEARS)  # Month-to-month jumps go back and forth between source years
+    dataset = CompactDataset.from_frame(frame)
+    assert dataset.offsets is not None
+    _assert_same(dataset, frame)
+    _assert_same(_npz_round_trip(dataset), frame)
+
+
+def test_irregular_spacing_falls_back_to_minutes():
+    index = pd.DatetimeIndex(['2020-01-01 00:00', '2020-01-01 00:07', '2020-01-01 01:00', '2020-01-01 01:45'], tz='UTC')
+    frame = pd.DataFrame({'temp_air': [1.0, 2.0, 3.0, 4.0], 'wind_speed': [0.5, 1.5, 2.5, 3.5]}, index=index)
+    dataset = CompactDataset.from_frame(frame)
+    assert dataset.step == pd.Timedelta(minutes=1)
+    _assert_same(_npz_round_trip(dataset), frame)
+
+
+@pytest.mark.parametrize('rows', [0, 1])
+def test_tiny_and_tz_naive_frames(rows):
+    index = pd.date_range('2020-06-01', periods=rows, freq='h')
+    frame = pd.DataFrame({'temp_air': np.arange(rows, dtype=float), 'wind_speed': np.arange(rows, dtype=float)}, index=index)
+    dataset = _npz_round_trip(CompactDataset.from_frame(frame))
+    assert dataset.size == rows and dataset.empty == (rows == 0)
+    if rows: _assert_same(dataset, frame)
+    assert 'tz_seconds' not in CompactDataset.from_frame(frame).to_arrays()
+
+
+def test_spill_round_trip_of_a_mixed_year_station(tmp_path):
+    frame = _frame(years=TMY_YEARS)
+    DatasetStore(spill_dir=str(tmp_path)).put('tmy', CompactDataset.from_frame(frame), {'city': "Test City", 'TZ': 5.5})
+    data, meta = DatasetStore(spill_dir=str(tmp_path)).get('tmy')
+    assert meta == {'city': "Test City", 'TZ': 5.5}
+    assert str(data.index().tz) == 'UTC+05:30'
+    _assert_same(data, frame)
@@ -0,0 +1,60 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from epw_samples import TMY_YEARS, calendar_records, epw_bytes
+from wind_temp_core import load_station, read_epw_bytes
+
+pvlib_epw = pytest.importorskip('pvlib.iotools')
+
+
+def _read_with_pvlib(content, tmp_path):
+    path = tmp_path / 'station.epw'
+    path.write_bytes(content)
+    return pvlib_epw.read_epw(str(path))
+
+
+@pytest.mark.parametrize('case', [
+    dict(),
+    dict(years=TMY_YEARS),
+    dict(newline='\r\n'),
+    dict(tz=5.5),
+    dict(tz=-3.5, years=TMY_YEARS, newline='\r\n'),
+], ids=['hourly', 'tmy_mixed_years', 'crlf', 'fractional_tz', 'combined'])
+def test_matches_pvlib(case, tmp_path):
+    content = epw_bytes(calendar_records(years=case.get('years', (1991,) * 12)), tz=case.get('tz', -5.0), newline=case.get('newline', '\n'))
+    data, meta = read_epw_bytes(content)
+    expected, expected_meta = _read_with_pvlib(content, tmp_path)
+    assert list(data.columns) == ['temp_air', 'wind_speed']
+    pd.testing.assert_index_equal(data.index, expected.index, check_names=False)
+    np.testing.assert_array_equal(data['temp_air'].to_numpy(), expected['temp_air'].to_numpy(dtype=np.float64))
+    np.testing.assert_array_equal(data['wind_speed'].to_numpy(), expected['wind_speed'].to_numpy(dtype=np.float64))
+    assert meta == expected_meta
+
+
+def test_sub_hourly_matches_pvlib_with_minute_offsets(tmp_path):
+    content = epw_bytes(calendar_records(records_per_hour=4), records_per_hour=4)
+    data, _ = read_epw_bytes(content)
+    expected, _ = _read_with_pvlib(content, tmp_path)
+    # pvlib stamps every record of an hour with the hour itself; the minutes are ours on top of that
+    pd.testing.assert_index_equal(data.index.floor('h'), expected.index, check_names=False)
+    np.testing.assert_array_equal(data.index.minute[:8], [0, 15, 30, 45] * 2)
+    np.testing.assert_array_equal(data['wind_speed'].to_numpy(), expected['wind_speed'].to_numpy(dtype=np.float64))
+
+
+def test_unknown_column_is_rejected():
+    with pytest.raises(ValueError, match='Unknown EPW columns'):
+        read_epw_bytes(epw_bytes(calendar_records()[:24]), columns=('temp_air', 'not_a_column'))
+
+
+def test_truncated_header_is_rejected():
+    with pytest.raises(ValueError, match='header lines'):
+        read_epw_bytes(b"LOCATION,Test City,ST,XYZ,Test,999999,40.00,-75.00,-5.0,100.0\nDESIGN CONDITIONS,0\n")
+
+
+def test_load_station_drops_incomplete_rows():
+    lines = epw_bytes(calendar_records()[:48]).split(b'\n')
+    fields = lines[10].split(b','); fields[21] = b''; lines[10] = b','.join(fields)  # Blank wind speed in record 3
+    data, meta = load_station(b'\n'.join(lines))
+    assert data.size == 47 and meta['city'] == "Test City"
+    assert data.temp_air.dtype == np.float32
@@ -0,0 +1,62 @@
+import numpy as np
+import pytest
+
+from wind_temp_core.stats import StatisticsIndex
+
+FACTORS = [1.37, 1.0, 0.62, -0.8, 0.0]
+
+
+@pytest.fixture(scope='module')
+def values():
+    rng = np.random.default_rng(3)
+    temp_air = np.round(rng.normal(15, 9, 5000), 1).astype(np.float32)
+    wind_speed = np.round(rng.weibull(2.0, 5000) * 4.5, 1).astype(np.float32)
+    return temp_air, wind_speed
+
+
+@pytest.fixture(scope='module')
+def index(values):
+    return StatisticsIndex(*values)
+
+
+@pytest.mark.parametrize('factor', FACTORS)
+@pytest.mark.parametrize('q', [0, 1, 37.5, 50, 95, 99, 100])
+def test_wind_percentile_matches_numpy(index, values, q, factor):
+    expected = np.percentile(values[1].astype(np.float64) * factor, q)
+    assert index.wind_percentile(q, factor) == pytest.approx(expected, rel=1e-6, abs=1e-6)
+
+
+@pytest.mark.parametrize('factor', FACTORS)
+def test_mean_wind_matches_numpy(index, values, factor):
+    assert index.mean_wind(factor) == pytest.approx(values[1].astype(np.float64).mean() * factor, rel=1e-9, abs=1e-12)
+
+
+@pytest.mark.parametrize('threshold', [-1.05, 0.0, 2.55, 5.05, 10.05])
+def test_exceedance_fraction_matches_numpy(index, values, threshold):
+    factors = np.array(FACTORS)
+    expected = [np.mean(values[1].astype(np.float64) * factor > threshold) for factor in factors]
+    np.testing.assert_allclose(index.exceedance_fraction(threshold, factors), expected)
+    assert index.exceedance_fraction(threshold, 1.37) == pytest.approx(expected[0])
+
+
+def test_exceedance_fraction_propagates_nan(index):
+    assert np.isnan(index.exceedance_fraction(5.0, np.array([np.nan, 1.0]))[0])
+
+
+@pytest.mark.parametrize('bounds', [(18.0, 32.0), (18.1, 18.1), (-40.0, 60.0), (25.0, 20.0), (100.0, 200.0)])
+def test_comfort_fraction_matches_numpy(index, values, bounds):
+    low, high = np.float32(bounds[0]), np.float32(bounds[1])  # Bounds compare in the stored precision
+    expected = np.mean((values[0] >= low) & (values[0] <= high))
+    assert index.comfort_fraction(*bounds) == pytest.approx(expected)
+
+
+def test_float64_input_stays_float64(values):
+    index = StatisticsIndex(values[0].astype(np.float64), values[1].astype(np.float64))
+    assert index.sorted_wind.dtype == np.float64
+    assert index.wind_percentile(95) == pytest.approx(np.percentile(values[1].astype(np.float64), 95))
+
+
+def test_empty_index():
+    index = StatisticsIndex(np.array([], dtype=np.float32), np.array([], dtype=np.float32))
+    assert index.summary(1.5, 18.0, 32.0, (50,)) == dict(avg=0.0, p95=0.0, comfort_pct=0.0, extra_percentiles=[(50, 0.0)])
+    np.testing.assert_array_equal(index.exceedance_fraction(5.0, np.array([1.0, -1.0])), [0.0, 0.0])
@@ -0,0 +1,52 @@
+import os
+
+import pytest
+
+from epw_samples import calendar_records, epw_bytes
+from wind_temp_core import load_station
+from wind_temp_core.store import DatasetStore, budget_from_env
+
+
+@pytest.fixture(scope='module')
+def station():
+    return load_station(epw_bytes(calendar_records()))
+
+
+def test_spill_restores_after_restart(station, tmp_path):
+    DatasetStore(spill_dir=str(tmp_path)).put('abc', *station)
+    restarted = DatasetStore(spill_dir=str(tmp_path))
+    data, meta = restarted.get('abc')
+    assert data.size == station[0].size and meta == station[1]
+    assert restarted.stats()['disk_hits'] == 1
+
+
+@pytest.mark.parametrize('content', [b'PK\x03\x04garbage', b'', b'not a zip file'])
+def test_corrupt_spill_file_is_a_miss_and_is_removed(content, station, tmp_path):
+    store = DatasetStore(spill_dir=str(tmp_path))
+    path = store._spill_path('abc')
+    with open(path, 'wb') as f: f.write(content)
+    assert store.get('abc') is None
+    assert not os.path.exists(path)
+    data, _ = store.get_or_load('abc', lambda: station)  # Parsed again and re-spilled
+    assert data.size == station[0].size and os.path.exists(path)
+
+
+def test_spill_directory_keeps_to_its_budget(station, tmp_path):
+    single = DatasetStore(spill_dir=str(tmp_path / 'one')); single.put('probe', *station)
+    file_size = os.path.getsize(single._spill_path('probe'))
+    store = DatasetStore(spill_dir=str(tmp_path / 'two'), spill_max_bytes=int(file_size * 2.5))
+    for i, digest in enumerate(['a', 'b']):
+        store.put(digest, *station)
+        os.utime(store._spill_path(digest), (i, i))  # Distinct modification times, 'a' oldest
+    store.put('c', *station)  # Three files exceed the budget: the least recently used one goes
+    assert store.stats()['spill_evictions'] == 1
+    assert sorted(name.split('.')[0] for name in os.listdir(tmp_path / 'two')) == ['b', 'c']
+
+
+@pytest.mark.parametrize('value, expected', [
+    (None, 7), ('', 7), ('abc', 7), ('0', 7), ('-5', 7), ('nan', 7), ('inf', 7),
+    ('1', 1024 * 1024), ('0.5', 512 * 1024), (' 64 ', 64 * 1024 * 1024),
+])
+def test_budget_from_env(value, expected):
+    environ = {} if value is None else {'WTV_CACHE_MAX_MB': value}
+    assert budget_from_env(environ, 'WTV_CACHE_MAX_MB', 7) == expected
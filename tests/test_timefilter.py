@@ -0,0 +1,95 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from epw_samples import TMY_YEARS, calendar_records, epw_bytes
+from wind_temp_core import load_station
+from wind_temp_core.stats import StatisticsIndex
+from wind_temp_core.timefilter import ALL_HOURS, ALL_MONTHS, ALL_WEEKDAYS, SEASONS, CalendarIndex, hour_bits, month_bits, weekday_bits
+
+FILTERS = [
+    dict(months=SEASONS['Summer (Jun-Aug)']),
+    dict(months=SEASONS['Winter (Dec-Feb)'], hours=(8, 18)),
+    dict(hours=(22, 24), weekdays=(5, 6)),
+    dict(months=(2,), hours=(0, 1), weekdays=(0,)),
+    dict(months=(4, 9), hours=(6, 20), weekdays=range(5)),
+]
+
+
+@pytest.fixture(scope='module', params=['single_year', 'tmy_mixed_years'])
+def station(request):
+    years = TMY_YEARS if request.param == 'tmy_mixed_years' else (1991,) * 12
+    data, _ = load_station(epw_bytes(calendar_records(years=years), tz=5.5))
+    return data, data.index()
+
+
+def _bits(months=range(1, 13), hours=(0, 24), weekdays=range(7)):
+    return month_bits(months), hour_bits(*hours), weekday_bits(weekdays)
+
+
+def _direct_mask(index, months=range(1, 13), hours=(0, 24), weekdays=range(7)):
+    return np.isin(index.month, list(months)) & (index.hour >= hours[0]) & (index.hour < hours[1]) & np.isin(index.dayofweek, list(weekdays))
+
+
+def test_bit_helpers():
+    assert month_bits(range(1, 13)) == ALL_MONTHS and hour_bits(0, 24) == ALL_HOURS and weekday_bits(range(7)) == ALL_WEEKDAYS
+    assert month_bits([1, 1, 12]) == 0b100000000001
+    assert hour_bits(8, 10) == 0b1100000000 and hour_bits(10, 8) == 0 and hour_bits(-3, 30) == ALL_HOURS
+
+
+def test_unfiltered_mask_is_none(station):
+    calendar = CalendarIndex(station[1])
+    assert calendar.mask(*_bits()) is None
+    assert calendar.count(*_bits()) == calendar.size == station[0].size
+
+
+@pytest.mark.parametrize('selection', FILTERS)
+def test_mask_and_count_match_the_datetime_fields(station, selection):
+    data, index = station
+    calendar = CalendarIndex(index)
+    expected = _direct_mask(index, **selection)
+    np.testing.assert_array_equal(calendar.mask(*_bits(**selection)), expected)
+    assert calendar.count(*_bits(**selection)) == expected.sum()
+
+
+def test_calendar_keeps_only_cell_codes(station):
+    calendar = CalendarIndex(station[1])
+    assert calendar.cell.dtype == np.uint16
+    assert not any(hasattr(calendar, name) for name in ('month', 'weekday', 'hour'))
+    assert calendar.nbytes == calendar.cell.nbytes + calendar.cell_counts.nbytes
+
+
+@pytest.mark.parametrize('selection', FILTERS)
+@pytest.mark.parametrize('factor', [1.3, -0.7])
+def test_subset_matches_an_index_of_the_masked_rows(station, selection, factor):
+    data, index = station
+    full = StatisticsIndex(data.temp_air, data.wind_speed)
+    orders = full.sort_orders()
+    mask = _direct_mask(index, **selection)
+    subset, direct = full.subset(mask, orders), StatisticsIndex(data.temp_air[mask], data.wind_speed[mask])
+    np.testing.assert_array_equal(subset.sorted_temp, direct.sorted_temp)
+    np.testing.assert_array_equal(subset.sorted_wind, direct.sorted_wind)
+    assert subset.summary(factor, 18.0, 32.0, (50, 99)) == direct.summary(factor, 18.0, 32.0, (50, 99))
+
+
+def test_sort_orders_are_int32_and_sort_the_rows(station):
+    data, _ = station
+    temp_order, wind_order = StatisticsIndex(data.temp_air, data.wind_speed).sort_orders()
+    assert temp_order.dtype == wind_order.dtype == np.int32
+    assert np.all(np.diff(data.temp_air[temp_order]) >= 0) and np.all(np.diff(data.wind_speed[wind_order]) >= 0)
+
+
+def test_subset_index_cannot_be_subset_again(station):
+    data, index = station
+    full = StatisticsIndex(data.temp_air, data.wind_speed)
+    subset = full.subset(np.asarray(index.month == 1), full.sort_orders())
+    with pytest.raises(ValueError): subset.sort_orders()
+    with pytest.raises(ValueError): subset.subset(np.ones(subset.size, dtype=bool), full.sort_orders())
+
+
+def test_empty_subset():
+    index = pd.date_range('2021-01-01', periods=48, freq='h', tz='UTC')
+    values = np.arange(48, dtype=np.float32)
+    full = StatisticsIndex(values, values)
+    subset = full.subset(CalendarIndex(index).mask(*_bits(months=(7,))), full.sort_orders())
+    assert subset.size == 0 and subset.summary(1.0, 18.0, 32.0)['comfort_pct'] == 0.0